@@ -11,25 +11,383 @@
 # - uvicorn 00_jumpstart.02_fastapi_jumpstart:app --reload
 # - Navigate to localhost:8000
 # - Navigate to localhost:8000/docs
+# - Score many leads at once: POST a JSON array, Arrow IPC or Parquet body to
+#   localhost:8000/predict/batch (see 3.0)
+# - Inference runs on a bounded pool, set with the environment variables
+#   ELS_INFERENCE_EXECUTOR ("thread" or "process"), ELS_INFERENCE_WORKERS and
+#   ELS_INFERENCE_MAX_QUEUE (see SETUP)
+# - Concurrent /predict calls are scored together in micro-batches, set with
+#   ELS_BATCH_MAX_DELAY_MS and ELS_BATCH_MAX_SIZE (see SETUP)
+# - Scoring uses the XGBoost booster directly once it matches predict_model on
+#   a probe set; ELS_FAST_INFERENCE=0 always uses predict_model (see SETUP)
+# - Responses only carry lead_id, prediction_label and prediction_score, as
+#   JSON, Arrow IPC, Parquet or MessagePack picked with the Accept header
 # - Shutdown App: Ctrl/Cmd + C
 
 
 # LIBRARIES
+import io
+import os
+import asyncio
+import itertools
+import warnings
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from multiprocessing import get_context
+import msgpack
+import numpy as np
+import orjson
 import pandas as pd
 import polars as pl
 import pycaret.classification as clf
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response
 
 # SETUP ----
 
+# Inference pool: predict_model blocks, so it runs off the event loop on
+# ELS_INFERENCE_WORKERS threads or processes. At most ELS_INFERENCE_MAX_QUEUE
+# further requests wait for a worker; beyond that requests get a 503 right away
+# instead of queueing without bound
+INFERENCE_EXECUTOR = os.environ.get("ELS_INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.environ.get("ELS_INFERENCE_WORKERS", os.cpu_count() or 1))
+INFERENCE_MAX_QUEUE = int(os.environ.get("ELS_INFERENCE_MAX_QUEUE", 2 * INFERENCE_WORKERS))
+
+if INFERENCE_EXECUTOR not in ("thread", "process"):
+    raise ValueError(f"ELS_INFERENCE_EXECUTOR must be 'thread' or 'process', got {INFERENCE_EXECUTOR!r}.")
+
+inference_slots = asyncio.Semaphore(INFERENCE_WORKERS + INFERENCE_MAX_QUEUE)
+
+# Micro-batching: single lead predictions wait up to ELS_BATCH_MAX_DELAY_MS for
+# others to share one predict_model call, at most ELS_BATCH_MAX_SIZE leads per
+# call. ELS_BATCH_MAX_SIZE=1 scores every request on its own
+BATCH_MAX_DELAY_MS = float(os.environ.get("ELS_BATCH_MAX_DELAY_MS", 5))
+BATCH_MAX_SIZE = int(os.environ.get("ELS_BATCH_MAX_SIZE", 64))
+
+# Native booster fast path (see * Native booster fast path)
+FAST_INFERENCE = os.environ.get("ELS_FAST_INFERENCE", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    
+    # process workers are spawned, not forked: by now XGBoost (parity probe)
+    # and polars have started threads, and forking a threaded process can
+    # deadlock the child. Each worker re-imports this module and reloads the model
+    if INFERENCE_EXECUTOR == "thread":
+        pool = ThreadPoolExecutor(max_workers = INFERENCE_WORKERS)
+    else:
+        pool = ProcessPoolExecutor(max_workers = INFERENCE_WORKERS, mp_context = get_context("spawn"))
+    
+    with pool:
+        app.state.inference_pool = pool
+        yield
+
 # Create the app object
-app = FastAPI()
+app = FastAPI(lifespan = lifespan)
 
 # Load trained Pipeline
 clf_model = clf.load_model('00_jumpstart/models/xgb_model_finalized')
 
+# Features the pipeline was trained on, and the dtypes batch inputs are cast to
+FEATURES = ["member_rating", "country_code"]
+FEATURE_DTYPES = {"member_rating": pl.Float64, "country_code": pl.Utf8}
+
+# Body formats accepted (and returned) by the batch endpoint
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPES = ["application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file"]
+PARQUET_MEDIA_TYPES = ["application/vnd.apache.parquet", "application/x-parquet"]
+
+# Response formats, negotiated with the Accept header
+MSGPACK_MEDIA_TYPES = ["application/msgpack", "application/x-msgpack", "application/vnd.msgpack"]
+RESPONSE_MEDIA_TYPES = [JSON_MEDIA_TYPE, *ARROW_MEDIA_TYPES, *PARQUET_MEDIA_TYPES, *MSGPACK_MEDIA_TYPES]
+
+# Batch input column identifying each lead in the response (row number if absent)
+LEAD_ID_COLUMN = "mailchimp_id"
+
+# Leads scored by both inference paths before the fast path is enabled
+# (the last country code is unseen in training)
+PARITY_PROBE_DF = pd.DataFrame(
+    itertools.product(
+        [1.0, 2.0, 3.0, 4.0, 5.0],
+        ["us", "in", "au", "uk", "br", "ca", "de", "fr", "es", "mx", "nl", "za", "xx"]
+    ),
+    columns = FEATURES
+)
+
+
+# * Native booster fast path ----
+class BoosterScorer:
+    """Scores leads with the fitted preprocessing steps and the XGBoost booster
+
+    Skips the per call overhead of predict_model: the preprocessing steps
+    (clf_model[:-1]) and the booster of the final XGBClassifier are extracted
+    once, encoded feature rows are cached per distinct lead (member_rating x
+    country_code is a small space), and the booster scores a float32 NumPy
+    matrix with inplace_predict. Returns the prediction_label and
+    prediction_score columns of predict_model.
+    """
+    
+    def __init__(self, pipeline, cache_size: int = 10_000):
+        self.preprocessor = pipeline[:-1]
+        self.booster = pipeline[-1].get_booster()
+        self.cache_size = cache_size
+        self._encoded = {}
+    
+    def encode(self, features_df: pd.DataFrame):
+        
+        # predict_model coerces inputs to the training dtypes; the booster does not
+        ratings = pd.to_numeric(features_df["member_rating"]).tolist()
+        countries = features_df["country_code"].tolist()
+        
+        # one hashable key per lead, missing values (NaN != NaN) as None
+        keys = [
+            (rating if rating == rating else None, country if country == country else None)
+            for rating, country in zip(ratings, countries)
+        ]
+        
+        # row of each lead in the matrix of distinct leads
+        distinct = {}
+        inverse = [distinct.setdefault(key, len(distinct)) for key in keys]
+        
+        # the cache dict is only ever replaced, never cleared, so this snapshot
+        # stays valid while other threads score
+        cache = self._encoded
+        new_keys = [key for key in distinct if key not in cache]
+        encoded_rows = {}
+        
+        if new_keys:
+            encoded = self.preprocessor.transform(pd.DataFrame(new_keys, columns = FEATURES))
+            
+            # sparse output (e.g. one-hot encoders): XGBoost treats entries absent
+            # from a sparse matrix as missing, not 0, so they become NaN
+            if hasattr(encoded, "tocoo"):
+                coo = encoded.tocoo()
+                encoded = np.full(coo.shape, np.nan, dtype = np.float32)
+                encoded[coo.row, coo.col] = coo.data
+            
+            encoded_rows = dict(zip(new_keys, np.asarray(encoded, dtype = np.float32)))
+            
+            if len(cache) + len(encoded_rows) > self.cache_size:
+                self._encoded = dict(encoded_rows)
+            else:
+                cache.update(encoded_rows)
+        
+        distinct_rows = np.stack(
+            [encoded_rows[key] if key in encoded_rows else cache[key] for key in distinct]
+        )
+        
+        return distinct_rows[inverse]
+    
+    def predict(self, features_df: pd.DataFrame):
+        
+        # binary:logistic -> probability of made_purchase = 1 (float32, widened
+        # so rounded scores match predict_model)
+        proba = self.booster.inplace_predict(self.encode(features_df)).astype(np.float64)
+        label = (proba > 0.5).astype(int)
+        
+        return features_df.assign(
+            prediction_label = label,
+            prediction_score = np.where(label == 1, proba, 1 - proba).round(4)
+        )
+
+def load_booster_scorer(pipeline):
+    
+    if not FAST_INFERENCE:
+        return None
+    
+    try:
+        scorer = BoosterScorer(pipeline)
+        
+        expected_df = clf.predict_model(pipeline, data = PARITY_PROBE_DF)
+        actual_df = scorer.predict(PARITY_PROBE_DF)
+        
+        parity = (
+            np.array_equal(expected_df["prediction_label"].to_numpy(), actual_df["prediction_label"].to_numpy())
+            and np.allclose(expected_df["prediction_score"].to_numpy(), actual_df["prediction_score"].to_numpy(), atol = 1e-4)
+        )
+    except Exception as e:
+        warnings.warn(f"Native booster inference unavailable ({e!r}), using predict_model")
+        return None
+    
+    if not parity:
+        warnings.warn("Native booster scores differ from predict_model on the probe set, using predict_model")
+        return None
+    
+    return scorer
+
+booster_scorer = load_booster_scorer(clf_model)
+
+# * Inference ----
+def score_leads(features_df: pd.DataFrame):
+    
+    if booster_scorer is not None:
+        return booster_scorer.predict(features_df)
+    
+    return clf.predict_model(clf_model, data = features_df)
+
+async def run_inference(func, *args):
+    
+    # backpressure: fail fast once every worker is busy and the queue is full
+    if inference_slots.locked():
+        raise HTTPException(
+            status_code = 503,
+            detail = "Scoring queue is full, retry later",
+            headers = {"Retry-After": "1"}
+        )
+    
+    async with inference_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(app.state.inference_pool, func, *args)
+
+# * Micro-batching ----
+class PredictionBatcher:
+    """Coalesces concurrent single lead predictions into one predict_model call
+
+    The first waiting request opens a batch, which is scored once max_batch_size
+    leads have joined or max_delay_ms has passed, whichever comes first. Each
+    request gets back its own rows of the scored batch. If scoring the batch
+    fails, its requests are scored again one at a time, so only the requests
+    whose own leads fail get the error.
+    """
+    
+    def __init__(self, max_delay_ms: float = 5, max_batch_size: int = 64):
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+    
+    async def predict(self, features_df: pd.DataFrame):
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((features_df, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._pending = self._pending, []
+        
+        # keep a reference so the task is not garbage collected mid-flight
+        task = asyncio.create_task(self._score(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _score(self, batch: list):
+        
+        try:
+            predictions_df = await run_inference(
+                score_leads, pd.concat([df for df, _ in batch], ignore_index = True)
+            )
+        except HTTPException as e:
+            # a full queue: every request of the batch gets the 503, retrying
+            # them one at a time would only add load
+            self._fail(batch, e)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch, e)
+            else:
+                # isolate the requests whose leads break scoring
+                for df, future in batch:
+                    if not future.done():
+                        await self._score([(df, future)])
+            return
+        
+        # fan the scored rows back out; a cancelled request just drops its rows
+        offset = 0
+        for df, future in batch:
+            if not future.done():
+                future.set_result(
+                    predictions_df.iloc[offset:offset + len(df)].reset_index(drop = True)
+                )
+            offset += len(df)
+    
+    @staticmethod
+    def _fail(batch: list, e: Exception):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+
+prediction_batcher = PredictionBatcher(
+    max_delay_ms = BATCH_MAX_DELAY_MS,
+    max_batch_size = BATCH_MAX_SIZE
+)
+
+# * Responses ----
+def negotiate_media_type(accept: str, default: str):
+    
+    if not accept:
+        return default
+    
+    # (q, position, media type): highest q first, header order breaks ties
+    offers = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        offers.append((-q, position, media_type))
+    
+    for neg_q, _, media_type in sorted(offers):
+        if neg_q >= 0:
+            break
+        if media_type in RESPONSE_MEDIA_TYPES:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return default
+    
+    raise HTTPException(
+        status_code = 406,
+        detail = f"Cannot respond with {accept!r}. Use one of {RESPONSE_MEDIA_TYPES}"
+    )
+
+def compact_scores(lead_ids, predictions_df: pd.DataFrame):
+    
+    # only what a caller needs to act on, not the echoed inputs
+    return pl.DataFrame(
+        {
+            "lead_id": lead_ids,
+            "prediction_label": predictions_df["prediction_label"].to_numpy(),
+            "prediction_score": predictions_df["prediction_score"].to_numpy(),
+        }
+    )
+
+def write_scores(scores_df: pl.DataFrame, media_type: str, single: bool = False):
+    
+    if media_type == JSON_MEDIA_TYPE or media_type in MSGPACK_MEDIA_TYPES:
+        # a single lead is one object, a batch is one list per column
+        content = scores_df.row(0, named = True) if single else scores_df.to_dict(as_series = False)
+        body = orjson.dumps(content) if media_type == JSON_MEDIA_TYPE else msgpack.packb(content)
+    else:
+        buffer = io.BytesIO()
+        
+        if media_type == ARROW_MEDIA_TYPES[0]:
+            scores_df.write_ipc_stream(buffer)
+        elif media_type == ARROW_MEDIA_TYPES[1]:
+            scores_df.write_ipc(buffer)
+        else:
+            scores_df.write_parquet(buffer)
+        
+        body = buffer.getvalue()
+    
+    return Response(content = body, media_type = media_type, headers = {"Vary": "Accept"})
+
 
 # 1.0 MAIN ----
 @app.get("/")
@@ -46,7 +404,7 @@ async def main():
 
 # 2.0 PREDICT ENDPOINT ----
 @app.post("/predict")
-async def predict(member_rating, country_code):
+async def predict(member_rating: float, country_code: str, request: Request, lead_id = None):
     
     # convert inputs to DataFrame
     df = pl.DataFrame(
@@ -56,15 +414,85 @@ async def predict(member_rating, country_code):
         }
     )
     
-    # fetch predictions
-    predictions_df = clf.predict_model(clf_model, data=df.to_pandas())
+    # fail before scoring if the client accepts none of the response formats
+    media_type = negotiate_media_type(request.headers.get("accept"), JSON_MEDIA_TYPE)
     
-    print(predictions_df)
+    # fetch predictions, scored together with concurrent requests
+    predictions_df = await prediction_batcher.predict(df.to_pandas())
     
-    # JSON and dictionary 
-    predictions_dict = predictions_df.to_dict()
+    # compact response in the format the client accepts
+    return write_scores(compact_scores([lead_id], predictions_df), media_type, single = True)
+
+# 3.0 BATCH PREDICT ENDPOINT ----
+
+# * Body -> DataFrame ----
+def read_json_leads(source: io.BytesIO):
+    
+    # array of lead records: [{"member_rating": 5, "country_code": "us"}, ...];
+    # parsed by orjson, as pl.read_json panics on some inputs (e.g. [])
+    records = orjson.loads(source.getvalue())
+    
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ValueError("expected a JSON array of lead objects")
+    
+    return pl.DataFrame(records, infer_schema_length = None)
+
+def read_leads(body: bytes, media_type: str):
+    
+    readers = {
+        JSON_MEDIA_TYPE: read_json_leads,
+        ARROW_MEDIA_TYPES[0]: pl.read_ipc_stream,
+        ARROW_MEDIA_TYPES[1]: pl.read_ipc,
+        **{media_type: pl.read_parquet for media_type in PARQUET_MEDIA_TYPES},
+    }
+    
+    if media_type not in readers:
+        raise HTTPException(
+            status_code = 415,
+            detail = f"Unsupported content type {media_type!r}. Use one of {list(readers)}"
+        )
+    
+    try:
+        leads_df = readers[media_type](io.BytesIO(body))
+    except Exception as e:
+        raise HTTPException(status_code = 400, detail = f"Could not read {media_type} body: {e}")
+    
+    if leads_df.height == 0:
+        raise HTTPException(status_code = 422, detail = "No leads to score")
+    
+    missing = [col for col in FEATURES if col not in leads_df.columns]
+    
+    if missing:
+        raise HTTPException(status_code = 422, detail = f"Missing columns {missing}")
+    
+    # same validation as the typed /predict parameters, before anything is scored
+    try:
+        return leads_df.with_columns(
+            [pl.col(col).cast(dtype, strict = True) for col, dtype in FEATURE_DTYPES.items()]
+        )
+    except Exception as e:
+        raise HTTPException(status_code = 422, detail = f"Invalid feature values: {e}")
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    
+    media_type = request.headers.get("content-type", JSON_MEDIA_TYPE).split(";")[0].strip()
+    
+    # fail before scoring if the client accepts none of the response formats;
+    # by default scores come back in the format they were sent in
+    response_media_type = negotiate_media_type(request.headers.get("accept"), media_type)
+    
+    leads_df = read_leads(await request.body(), media_type)
+    
+    # one vectorized pass of the pipeline over all leads
+    predictions_df = await run_inference(score_leads, leads_df.select(FEATURES).to_pandas())
+    
+    lead_ids = (
+        leads_df[LEAD_ID_COLUMN] if LEAD_ID_COLUMN in leads_df.columns
+        else np.arange(leads_df.height)
+    )
     
-    return JSONResponse(content=predictions_dict)
+    return write_scores(compact_scores(lead_ids, predictions_df), response_media_type)
 
 if __name__ == '__main__':
     main()
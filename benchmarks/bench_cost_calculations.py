@@ -0,0 +1,260 @@
+"""Benchmark suite for email_lead_scoring.cost_calculations
+
+Records wall time and peak memory of the cost engine over grid sizes from 10 to
+10^6 points and several n_periods, and compares them against a stored baseline.
+
+Run from the project root:
+    python -m benchmarks.bench_cost_calculations --save-baseline   # record baseline
+    python -m benchmarks.bench_cost_calculations                   # compare
+    python -m benchmarks.bench_cost_calculations -k simulate       # subset
+
+Each case runs in a fresh spawned process. It is called once to warm up (lazy
+imports, first-call caches), then peak memory is the peak resident set size
+(RSS) of one further call above the RSS after warm-up, so neither import costs
+nor the memory held by the case's setup are counted. RSS includes Polars' Rust
+allocator and NumPy buffers alike. On Linux the kernel's peak RSS mark is reset
+before the call (/proc/self/clear_refs) and read back after it; elsewhere RSS is
+sampled every millisecond with psutil when it is installed, and memory is not
+compared without it. The cost cache is disabled so every repeat does the full
+work.
+
+Absolute timings only compare on the same hardware, so baselines are stored per
+machine (--machine, by default host name, architecture and CPU count).
+Comparing fails when this machine has no baseline for a case.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+GRID_SIZES = [10, 10**2, 10**3, 10**4, 10**5, 10**6]
+
+N_PERIODS = [12, 120, 1200]
+
+# BENCHMARK CASES ----
+
+def _grid_axes(n_points):
+    """Growth and conversion rate axes whose product has about n_points points."""
+    n_axis = max(1, int(round(np.sqrt(n_points))))
+    return np.linspace(0, 0.10, n_axis), np.linspace(0, 0.10, n_axis)
+
+def setup_cost_table(n_periods):
+    import email_lead_scoring as els
+    return lambda: els.cost_calc_monthly_cost_table(n_periods = n_periods)
+
+def setup_total_unsub_cost(n_periods):
+    import email_lead_scoring as els
+    cost_table_df = els.cost_calc_monthly_cost_table(n_periods = n_periods)
+    return lambda: els.cost_total_unsub_cost(cost_table_df)
+
+def setup_total_unsub_cost_analytic(n_periods):
+    import email_lead_scoring as els
+    return lambda: els.cost_total_unsub_cost_analytic(n_periods = n_periods)
+
+def setup_simulate(n_points):
+    import email_lead_scoring as els
+    growth_rate, conversion_rate = _grid_axes(n_points)
+    return lambda: els.cost_simulate_unsub_costs(growth_rate, conversion_rate, n_periods = 36)
+
+def setup_sweep(n_points):
+    import email_lead_scoring as els
+    growth_rate, conversion_rate = _grid_axes(n_points)
+    parameters = {
+        "email_list_growth_rate": growth_rate,
+        "customer_conversion_rate": conversion_rate,
+        "n_periods": N_PERIODS,
+    }
+    return lambda: els.cost_sweep_unsub_costs(parameters, chunk_size = 250_000).collect()
+
+def setup_plot(n_points):
+    import email_lead_scoring as els
+    growth_rate, conversion_rate = _grid_axes(n_points)
+    simulation_results = els.cost_simulate_unsub_costs(growth_rate, conversion_rate)
+    return lambda: els.cost_plot_simulated_unsub_cost(simulation_results, max_resolution = (200, 200))
+
+BENCHMARKS = {
+    **{f"cost_table[n_periods={n}]": (setup_cost_table, n) for n in N_PERIODS},
+    **{f"total_unsub_cost[n_periods={n}]": (setup_total_unsub_cost, n) for n in N_PERIODS},
+    **{f"total_unsub_cost_analytic[n_periods={n}]": (setup_total_unsub_cost_analytic, n) for n in N_PERIODS},
+    **{f"simulate[points={n}]": (setup_simulate, n) for n in GRID_SIZES},
+    **{f"sweep[points={n * len(N_PERIODS)}]": (setup_sweep, n) for n in GRID_SIZES},
+    **{f"plot[points={n}]": (setup_plot, n) for n in GRID_SIZES},
+}
+
+# PEAK MEMORY ----
+
+def _proc_status(field):
+    """Reads a kB field of /proc/self/status in bytes."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+
+def _peak_rss_linux(func):
+    """Peak RSS of func() above the RSS before it, from the kernel's high-water mark."""
+    
+    # writing 5 resets VmHWM to the current RSS
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    
+    baseline = _proc_status("VmRSS")
+    func()
+    
+    return _proc_status("VmHWM") - baseline
+
+def _peak_rss_sampled(func, interval = 1e-3):
+    """Peak RSS of func() above the RSS before it, sampled every interval seconds with psutil."""
+    
+    import psutil
+    
+    process = psutil.Process()
+    baseline = peak = process.memory_info().rss
+    done = threading.Event()
+    
+    def sample():
+        nonlocal peak
+        while not done.wait(interval):
+            peak = max(peak, process.memory_info().rss)
+    
+    sampler = threading.Thread(target = sample)
+    sampler.start()
+    try:
+        func()
+    finally:
+        done.set()
+        sampler.join()
+    
+    return max(peak, process.memory_info().rss) - baseline
+
+def _peak_rss(func):
+    """Peak RSS of one func() call above the RSS before it, or None when it cannot be measured."""
+    
+    if os.path.exists("/proc/self/clear_refs"):
+        try:
+            return _peak_rss_linux(func)
+        except OSError:
+            pass
+    
+    try:
+        return _peak_rss_sampled(func)
+    except ImportError:
+        func()
+        return None
+
+def machine_name():
+    """Default baseline key: host name, architecture and CPU count."""
+    return f"{platform.node()}-{platform.machine()}-{os.cpu_count()}cpu"
+
+# RUNNER ----
+
+def _run_case(name, repeat):
+    """Runs one benchmark case in the current (fresh) process."""
+    
+    import email_lead_scoring as els
+    els.cost_cache_configure(max_entries = 0)
+    
+    setup, arg = BENCHMARKS[name]
+    func = setup(arg)
+    
+    # warm-up call, then the peak RSS of one further call
+    func()
+    
+    peakmem = _peak_rss(func)
+    
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    
+    return {
+        "time": min(timings),
+        "peakmem": peakmem,
+    }
+
+def run_benchmarks(names, repeat = 5):
+    """Runs each benchmark in its own spawned process and returns {name: result}."""
+    
+    context = mp.get_context("spawn")
+    results = {}
+    
+    for name in names:
+        with context.Pool(1, maxtasksperchild = 1) as pool:
+            results[name] = pool.apply(_run_case, (name, repeat))
+        peakmem = results[name]["peakmem"]
+        print(f"{name:<45} {results[name]['time'] * 1e3:>10.3f} ms {'n/a' if peakmem is None else f'{peakmem / 2**20:.1f}':>9} MB")
+    
+    return results
+
+def compare_to_baseline(results, baseline, tolerance = 0.25):
+    """Returns the names whose time or peak memory regressed by more than tolerance, or that have no baseline."""
+    
+    regressions = []
+    
+    for name, result in results.items():
+        if name not in baseline:
+            regressions.append(name)
+            print(f"NO BASELINE {name}; run with --save-baseline to record it")
+            continue
+        for metric in ("time", "peakmem"):
+            if result[metric] is None or baseline[name][metric] is None:
+                continue
+            # ignore sub-millisecond noise, and RSS noise (pages, allocator arenas) below 4 MB
+            floor = 4 * 2**20 if metric == "peakmem" else 1e-3
+            limit = max(baseline[name][metric], floor) * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(name)
+                print(f"REGRESSION {name} {metric}: {result[metric]:.6g} > {baseline[name][metric]:.6g} (+{tolerance:.0%})")
+    
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark the email_lead_scoring cost engine.")
+    parser.add_argument("-k", dest = "keyword", default = "", help = "only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type = int, default = 5, help = "timed repeats per benchmark (best is kept)")
+    parser.add_argument("--tolerance", type = float, default = 0.25, help = "allowed relative slowdown vs baseline")
+    parser.add_argument("--baseline", default = BASELINE_PATH, help = "baseline JSON file")
+    parser.add_argument("--machine", default = machine_name(), help = "baseline key of this machine")
+    parser.add_argument("--save-baseline", action = "store_true", help = "store the results as the new baseline")
+    args = parser.parse_args()
+    
+    names = [name for name in BENCHMARKS if args.keyword in name]
+    results = run_benchmarks(names, repeat = args.repeat)
+    
+    # {machine: {"machine": description, "results": {name: result}}}
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    
+    if args.save_baseline:
+        entry = baselines.setdefault(args.machine, {"results": {}})
+        entry["machine"] = {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        }
+        entry["results"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent = 2, sort_keys = True)
+        print(f"Baseline for {args.machine} saved to {args.baseline}")
+        return 0
+    
+    if args.machine not in baselines:
+        print(f"No baseline for machine {args.machine!r} in {args.baseline} (recorded: {sorted(baselines)}); run with --save-baseline first.")
+        return 1
+    
+    return 1 if compare_to_baseline(results, baselines[args.machine]["results"], tolerance = args.tolerance) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
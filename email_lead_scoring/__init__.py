@@ -2,12 +2,32 @@
 from .cost_calculations import(
     cost_calc_monthly_cost_table,
     cost_total_unsub_cost,
+    cost_total_unsub_cost_analytic,
+    cost_sweep_unsub_costs,
     cost_simulate_unsub_costs,
-    cost_plot_simulated_unsub_cost
+    cost_simulate_unsub_costs_mc,
+    cost_plot_simulated_unsub_cost,
+    cost_cache_info,
+    cost_cache_clear,
+    cost_cache_configure
 )
 
 from .database import(
     db_read_els_data,
     db_read_els_table_names,
-    db_read_raw_els_table
+    db_read_raw_els_table,
+    db_iter_raw_els_table,
+    db_refresh_els_data,
+    db_maintain_els_database,
+    db_get_engine,
+    db_get_els_catalog,
+    db_dispose_engines
+)
+
+from .database_async import(
+    db_read_els_data_async,
+    db_read_els_table_names_async,
+    db_read_raw_els_table_async,
+    db_get_async_engine,
+    db_dispose_async_engines
 )
@@ -1,9 +1,205 @@
+import os
+import inspect
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from multiprocessing import get_context
 import pandas as pd
 import numpy as np
-import janitor as jn
 import polars as pl
 import plotly.express as px
 
+COST_PARAMETERS = (
+    "email_list_size",
+    "email_list_growth_rate",
+    "sales_emails_per_month",
+    "unsub_rate_per_sales_email",
+    "customer_conversion_rate",
+    "average_customer_value",
+    "n_periods"
+)
+
+DEFAULT_COST_PRIORS = {
+    "email_list_growth_rate": ("normal", 0.035, 0.01),
+    "unsub_rate_per_sales_email": ("beta", 5, 995),
+    "customer_conversion_rate": ("beta", 5, 95),
+}
+
+# COST CACHE ----
+
+class _CostCache:
+    """
+    Bounded LRU cache of cost results, limited by entry count and estimated bytes.
+    """
+    
+    def __init__(self, max_entries: int = 256, max_bytes: int = 256 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+    
+    def put(self, key, value, n_bytes: int):
+        with self._lock:
+            if n_bytes > self.max_bytes:
+                return
+            if key in self._entries:
+                self._n_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, n_bytes)
+            self._n_bytes += n_bytes
+            self._evict()
+    
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._n_bytes > self.max_bytes
+        ):
+            _, (_, n_bytes) = self._entries.popitem(last = False)
+            self._n_bytes -= n_bytes
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._n_bytes = 0
+            self.hits = 0
+            self.misses = 0
+    
+    def info(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._n_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+_COST_CACHE = _CostCache()
+
+def _cost_cache_round(values: np.ndarray, sig_digits: int = 12):
+    """
+    Rounds a float array to sig_digits significant digits.
+    """
+    
+    with np.errstate(divide = "ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    
+    scale = 10.0 ** np.where(np.isfinite(magnitude), sig_digits - 1 - magnitude, 0)
+    
+    return np.round(values * scale) / scale
+
+def _cost_cache_normalize(value):
+    """
+    Turns a parameter value into a hashable, float-tolerant cache key component.
+    Numbers are rounded to 12 significant digits; arrays and lists become
+    (shape, dtype, bytes) tuples so long sweeps hash quickly. Integers and floats
+    keep their kind in the key, since they can produce different column dtypes
+    (100000 vs 1e5), so the tolerance only applies within a kind.
+    """
+    
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        kind = "i" if isinstance(value, (int, np.integer)) else "f"
+        return (kind, float(f"{value:.12g}"))
+    if isinstance(value, (list, tuple, np.ndarray, pl.Series)):
+        values = np.asarray(value)
+        kind = values.dtype.kind
+        if kind in "iuf":
+            values = _cost_cache_round(values.astype(float))
+            return (values.shape, kind, values.tobytes())
+        return (values.shape, values.dtype.str, values.tobytes())
+    if isinstance(value, dict):
+        return tuple(sorted((k, _cost_cache_normalize(v)) for k, v in value.items()))
+    return value
+
+def _cost_cached(func):
+    """
+    Memoizes a cost function in the shared LRU cost cache.
+
+    Calls are keyed on the bound arguments (defaults applied) after normalization,
+    so 0.05, np.float64(0.05) and 0.05000000000000001 share one entry. Only DataFrame
+    results are cached, and they are cloned on the way out so callers cannot mutate
+    cached entries. Calls with lazy=True or an output_dir bypass the cache without
+    counting as hits or misses.
+    """
+    
+    signature = inspect.signature(func)
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        
+        if bound.arguments.get("lazy") is True or bound.arguments.get("output_dir") is not None:
+            return func(*args, **kwargs)
+        
+        try:
+            key = (func.__qualname__, _cost_cache_normalize(dict(bound.arguments)))
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs)
+        
+        result = _COST_CACHE.get(key)
+        
+        if result is None:
+            result = func(*args, **kwargs)
+            
+            # lazy plans and scans of on-disk output are cheap to rebuild, and
+            # caching them would skip writing the output on a repeat call
+            if not isinstance(result, pl.DataFrame):
+                return result
+            
+            _COST_CACHE.put(key, result, result.estimated_size())
+        
+        return result.clone()
+    
+    return wrapper
+
+def cost_cache_info():
+    """
+    Returns the hit/miss statistics and size of the cost cache.
+
+    Returns:
+        dict: hits, misses, entries, bytes, max_entries and max_bytes.
+    """
+    return _COST_CACHE.info()
+
+def cost_cache_clear():
+    """
+    Empties the cost cache and resets its statistics.
+    """
+    _COST_CACHE.clear()
+
+def cost_cache_configure(max_entries: int = None, max_bytes: int = None):
+    """
+    Sets the limits of the cost cache, evicting entries that no longer fit.
+
+    Args:
+        max_entries (int, optional): Maximum number of cached results. Defaults to None (unchanged).
+        max_bytes (int, optional): Maximum estimated size of all cached results. Defaults to None (unchanged).
+    """
+    with _COST_CACHE._lock:
+        if max_entries is not None:
+            _COST_CACHE.max_entries = max_entries
+        if max_bytes is not None:
+            _COST_CACHE.max_bytes = max_bytes
+        _COST_CACHE._evict()
+
+# COST CALCULATIONS ----
+
+@_cost_cached
 def cost_calc_monthly_cost_table(
     email_list_size: int = 1e5,
     email_list_growth_rate: float = 0.035,
@@ -11,7 +207,8 @@ def cost_calc_monthly_cost_table(
     unsub_rate_per_sales_email: float = 0.005,
     customer_conversion_rate: float = 0.05,
     average_customer_value: float = 2000,
-    n_periods: int = 12
+    n_periods: int = 12,
+    lazy: bool = False
 ):
     """
     Calculates the monthly cost table based on the given parameters.
@@ -24,9 +221,10 @@ def cost_calc_monthly_cost_table(
         customer_conversion_rate (float, optional): The rate at which customers convert. Defaults to 0.05.
         average_customer_value (float, optional): The average value of a customer. Defaults to 2000.
         n_periods (int, optional): The number of periods to calculate the cost table for. Defaults to 12.
+        lazy (bool, optional): Return the un-collected pl.LazyFrame plan so it can be composed with other queries. Defaults to False.
 
     Returns:
-        pandas.DataFrame: The cost table containing the following columns:
+        pl.DataFrame: The cost table (pl.LazyFrame when lazy=True) containing the following columns:
             - period: The period number.
             - email_list_size_no_growth: The email list size without growth.
             - lost_customers_no_growth: The number of lost customers without growth.
@@ -36,55 +234,62 @@ def cost_calc_monthly_cost_table(
             - cost_with_growth: The cost with growth.
     """
     
-    period_series = pl.Series("period", np.arange(0, n_periods))
+    # Email Size - No Growth
+    email_list_size_no_growth = pl.lit(email_list_size)
     
-    cost_table_df = period_series.to_frame()
+    # Lost Customers - No Growth
+    lost_customers_no_growth = (
+        email_list_size_no_growth *
+        unsub_rate_per_sales_email *
+        sales_emails_per_month *
+        customer_conversion_rate
+    )
     
-    cost_table_df = (
-        cost_table_df
-        # Email Size - No Growth
-        .with_columns(
-            pl.lit(email_list_size).alias("email_list_size_no_growth")
-         )
-        # Lost Customers - No Growth
-        .with_columns(
-            (pl.col("email_list_size_no_growth") * 
-                unsub_rate_per_sales_email * 
-                sales_emails_per_month * 
-                customer_conversion_rate)
-            .alias("lost_customers_no_growth")
-        )
-        # Cost - No Growth
-        .with_columns(
-            (pl.col("lost_customers_no_growth") *
-                customer_conversion_rate * 
-                average_customer_value)
-            .alias("cost_no_growth")
-        )
-        # Email Size - With Growth
-        .with_columns(
-            (pl.col("email_list_size_no_growth") *
-                (1 + email_list_growth_rate) ** pl.col("period"))
-            .alias("email_list_size_with_growth")
-        )
-        # Lost Customers - With Growth
-        .with_columns(
-            (pl.col("email_list_size_with_growth") *
-                unsub_rate_per_sales_email * 
-                sales_emails_per_month * 
-                customer_conversion_rate)
-            .alias("lost_customers_with_growth")
-        )
-        # Cost - With Growth
+    # Cost - No Growth
+    cost_no_growth = (
+        lost_customers_no_growth *
+        customer_conversion_rate *
+        average_customer_value
+    )
+    
+    # Email Size - With Growth
+    email_list_size_with_growth = (
+        email_list_size_no_growth *
+        (1 + email_list_growth_rate) ** pl.col("period")
+    )
+    
+    # Lost Customers - With Growth
+    lost_customers_with_growth = (
+        email_list_size_with_growth *
+        unsub_rate_per_sales_email *
+        sales_emails_per_month *
+        customer_conversion_rate
+    )
+    
+    # Cost - With Growth
+    cost_with_growth = (
+        lost_customers_with_growth *
+        customer_conversion_rate *
+        average_customer_value
+    )
+    
+    # one projection: the repeated subexpressions are shared by the optimizer
+    cost_table_lf = (
+        pl.LazyFrame({"period": np.arange(0, n_periods)})
         .with_columns(
-            (pl.col("lost_customers_with_growth") *
-                customer_conversion_rate * 
-                average_customer_value)
-            .alias("cost_with_growth")
+            email_list_size_no_growth.alias("email_list_size_no_growth"),
+            lost_customers_no_growth.alias("lost_customers_no_growth"),
+            cost_no_growth.alias("cost_no_growth"),
+            email_list_size_with_growth.alias("email_list_size_with_growth"),
+            lost_customers_with_growth.alias("lost_customers_with_growth"),
+            cost_with_growth.alias("cost_with_growth")
         )
     )
     
-    return cost_table_df
+    if lazy:
+        return cost_table_lf
+    
+    return cost_table_lf.collect()
 
 def cost_total_unsub_cost(cost_table_df: pl.DataFrame):
     """
@@ -106,82 +311,634 @@ def cost_total_unsub_cost(cost_table_df: pl.DataFrame):
 
     return summary_df
 
+def cost_total_unsub_cost_analytic(
+    email_list_size: int = 1e5,
+    email_list_growth_rate: float = 0.035,
+    sales_emails_per_month: int = 5,
+    unsub_rate_per_sales_email: float = 0.005,
+    customer_conversion_rate: float = 0.05,
+    average_customer_value: float = 2000,
+    n_periods: int = 12
+):
+    """
+    Calculate the total cost of email unsubscriptions without building the cost table.
+
+    Equivalent to cost_total_unsub_cost(cost_calc_monthly_cost_table(...)), but the
+    with-growth total is computed from the closed form of the geometric series, so
+    the cost is O(1) regardless of n_periods. Arguments may also be NumPy arrays, in
+    which case they are broadcast and one row is returned per element.
+
+    Args:
+        email_list_size (int, optional): The initial size of the email list. Defaults to 1e5.
+        email_list_growth_rate (float, optional): The monthly growth rate of the email list. Defaults to 0.035.
+        sales_emails_per_month (int, optional): The number of sales emails sent per month. Defaults to 5.
+        unsub_rate_per_sales_email (float, optional): The unsubscribe rate per sales email. Defaults to 0.005.
+        customer_conversion_rate (float, optional): The rate at which customers convert. Defaults to 0.05.
+        average_customer_value (float, optional): The average value of a customer. Defaults to 2000.
+        n_periods (int, optional): The number of periods to sum over. Defaults to 12.
+
+    Returns:
+        pl.DataFrame: DataFrame with the summary of total unsubscribed cost.
+    """
+    
+    cost_no_growth, cost_with_growth = _cost_unsub_totals(
+        email_list_size = email_list_size,
+        email_list_growth_rate = email_list_growth_rate,
+        sales_emails_per_month = sales_emails_per_month,
+        unsub_rate_per_sales_email = unsub_rate_per_sales_email,
+        customer_conversion_rate = customer_conversion_rate,
+        average_customer_value = average_customer_value,
+        n_periods = n_periods
+    )
+    
+    summary_df = pl.DataFrame(
+        {
+            "cost_no_growth": np.ravel(cost_no_growth),
+            "cost_with_growth": np.ravel(cost_with_growth)
+        }
+    )
+    
+    return summary_df
+
+def _geometric_series_sum(growth_rate, n_periods):
+    """
+    Sum of (1 + growth_rate) ** period for period in 0 .. n_periods - 1.
+
+    Uses expm1/log1p so small growth rates stay accurate, and falls back to
+    n_periods where the growth rate or n_periods is zero (an empty sum, which the
+    closed form turns into 0 * -inf = nan for a growth rate of -1).
+    """
+    
+    growth_rate = np.asarray(growth_rate, dtype = float)
+    n_periods = np.asarray(n_periods, dtype = float)
+    
+    with np.errstate(divide = "ignore", invalid = "ignore", over = "ignore"):
+        series_sum = np.expm1(n_periods * np.log1p(growth_rate)) / growth_rate
+    
+    return np.where((growth_rate == 0) | (n_periods == 0), n_periods, series_sum)
+
+def _cost_unsub_totals(
+    email_list_growth_rate = 0.035,
+    customer_conversion_rate = 0.05,
+    email_list_size = 1e5,
+    sales_emails_per_month = 5,
+    unsub_rate_per_sales_email = 0.005,
+    average_customer_value = 2000,
+    n_periods = 12
+):
+    """
+    Vectorized totals of cost_no_growth and cost_with_growth.
+
+    All parameters may be scalars or NumPy arrays and are broadcast against each
+    other. The period sum is evaluated in closed form, so no period axis is built.
+
+    Returns:
+        tuple: (cost_no_growth, cost_with_growth) as NumPy arrays.
+    """
+    
+    # Cost per subscriber: lost customer rate * conversion * customer value
+    customer_conversion_rate = np.asarray(customer_conversion_rate, dtype = float)
+    
+    cost_per_subscriber = (
+        unsub_rate_per_sales_email *
+        sales_emails_per_month *
+        customer_conversion_rate *
+        customer_conversion_rate *
+        average_customer_value
+    )
+    
+    cost_no_growth = email_list_size * n_periods * cost_per_subscriber
+    
+    cost_with_growth = (
+        email_list_size *
+        _geometric_series_sum(email_list_growth_rate, n_periods) *
+        cost_per_subscriber
+    )
+    
+    return np.broadcast_arrays(cost_no_growth, cost_with_growth)
+
+def _cost_sweep_shard(
+    values: dict,
+    grid_shape: tuple,
+    start: int,
+    stop: int,
+    kwargs: dict,
+    column_names: dict = None
+):
+    """
+    Evaluates grid points start .. stop - 1 of a cost parameter sweep.
+
+    Module level so it can be pickled and run on a process pool. Returns plain
+    NumPy columns: they pickle as raw buffers, which is far cheaper than
+    shipping DataFrames back from the workers. Swept parameters are named by
+    column_names where given.
+    """
+    
+    column_names = column_names or {}
+    
+    flat_index = np.arange(start, stop)
+    grid_index = np.unravel_index(flat_index, grid_shape)
+    
+    shard_values = {
+        name: value[index] for (name, value), index in zip(values.items(), grid_index)
+    }
+    
+    cost_no_growth, cost_with_growth = _cost_unsub_totals(**shard_values, **kwargs)
+    
+    return {
+        "cost_no_growth": np.ascontiguousarray(cost_no_growth),
+        "cost_with_growth": np.ascontiguousarray(cost_with_growth),
+        **{column_names.get(name, name): value for name, value in shard_values.items()}
+    }
+
+def _cost_sweep_write_shard(part: int, output_dir: str, partition_by: list, *shard_args):
+    """
+    Evaluates one shard and writes it as Parquet, so process workers never ship
+    results back to the parent. With partition_by the shard is split into a
+    hive-style layout (output_dir/<column>=<value>/part-<part>.parquet) and the
+    partition columns are only stored in the directory names.
+
+    Returns:
+        int: Number of rows written.
+    """
+    
+    shard_df = pl.DataFrame(_cost_sweep_shard(*shard_args))
+    file_name = f"part-{part:05d}.parquet"
+    
+    if not partition_by:
+        shard_df.write_parquet(os.path.join(output_dir, file_name))
+        return shard_df.height
+    
+    for partition_df in shard_df.partition_by(partition_by, maintain_order = True):
+        
+        partition_dir = os.path.join(
+            output_dir,
+            *[f"{column}={partition_df[column][0]}" for column in partition_by]
+        )
+        os.makedirs(partition_dir, exist_ok = True)
+        
+        partition_df.drop(partition_by).write_parquet(os.path.join(partition_dir, file_name))
+    
+    return shard_df.height
+
+def _cost_sweep_chunks(
+    parameters: dict,
+    chunk_size: int = 1_000_000,
+    executor: str = "serial",
+    n_workers: int = None,
+    column_names: dict = None,
+    output_dir: str = None,
+    partition_by: list = None,
+    **kwargs
+):
+    """
+    Yields the Cartesian product sweep of the cost parameters in chunks.
+
+    Grid points are generated from flat indices with np.unravel_index, so only
+    chunk_size points are ever held in memory per shard. The first parameter
+    varies slowest and the last one fastest (same order as expand_grid). With
+    executor="process" the shards run on a spawned process pool and are yielded
+    back in grid order, so the output is identical to the serial run. At most two
+    shards per worker are in flight, so finished shards never pile up in the
+    parent. Each shard is cheap closed-form NumPy work, so the pool only pays off
+    when shards are large relative to the cost of starting the workers.
+
+    With output_dir each shard is written to Parquet where it is computed (by the
+    worker under executor="process") and only its row count is yielded.
+
+    Yields:
+        pl.DataFrame: cost_no_growth, cost_with_growth and one column per swept parameter (int row counts with output_dir).
+    """
+    
+    unknown = set(parameters) - set(COST_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown cost parameters: {sorted(unknown)}. Expected any of {COST_PARAMETERS}.")
+    
+    overlap = set(parameters) & set(kwargs)
+    if overlap:
+        raise ValueError(f"Parameters passed both as sweep values and scalars: {sorted(overlap)}.")
+    
+    if executor not in ("serial", "process"):
+        raise ValueError(f"executor must be 'serial' or 'process', got {executor!r}.")
+    
+    values = {name: np.asarray(value).ravel() for name, value in parameters.items()}
+    
+    empty = [name for name, value in values.items() if value.size == 0]
+    if empty:
+        raise ValueError(f"Sweep parameters without values: {empty}.")
+    
+    grid_shape = tuple(value.size for value in values.values())
+    n_points = int(np.prod(grid_shape))
+    
+    def shard_task(part, start):
+        shard_args = (values, grid_shape, start, min(start + chunk_size, n_points), kwargs, column_names)
+        if output_dir is None:
+            return _cost_sweep_shard, shard_args
+        return _cost_sweep_write_shard, (part, output_dir, partition_by, *shard_args)
+    
+    def shard_result(result):
+        return result if output_dir is not None else pl.DataFrame(result)
+    
+    if executor == "serial":
+        for part, start in enumerate(range(0, n_points, chunk_size)):
+            func, args = shard_task(part, start)
+            yield shard_result(func(*args))
+        return
+    
+    # at least one shard per worker so small grids still use every core
+    n_workers = n_workers or os.cpu_count()
+    chunk_size = max(1, min(chunk_size, -(-n_points // n_workers)))
+    
+    # spawn: forking after polars has started its thread pool can deadlock
+    with ProcessPoolExecutor(max_workers = n_workers, mp_context = get_context("spawn")) as pool:
+        
+        # bounded window of in-flight shards, consumed in submission order
+        # -> deterministic output and flat memory in the parent
+        pending = deque()
+        
+        for part, start in enumerate(range(0, n_points, chunk_size)):
+            func, args = shard_task(part, start)
+            pending.append(pool.submit(func, *args))
+            if len(pending) >= 2 * n_workers:
+                yield shard_result(pending.popleft().result())
+        
+        while pending:
+            yield shard_result(pending.popleft().result())
+
+def cost_sweep_unsub_costs(
+    parameters: dict,
+    chunk_size: int = 1_000_000,
+    output_dir: str = None,
+    partition_by: list = None,
+    executor: str = "serial",
+    n_workers: int = None,
+    max_points_in_memory: int = 5_000_000,
+    column_names: dict = None,
+    **kwargs
+):
+    """
+    Sweeps the unsubscribed costs over the Cartesian product of any cost parameters.
+
+    Any subset of the cost_calc_monthly_cost_table arguments can be swept by passing
+    an array of values for it. The grid is evaluated chunk by chunk. Without
+    output_dir the chunks are concatenated, so the whole result is held in memory;
+    grids larger than max_points_in_memory are refused. When output_dir is given each
+    chunk is written to its own Parquet file as soon as it is computed, and the result
+    is a lazy scan over those files, so memory stays bounded by chunk_size for any
+    grid size. With partition_by the files are laid out as a hive-style dataset
+    (output_dir/<column>=<value>/part-<chunk>.parquet); the partition columns are
+    only stored in the directory names, so the dataset can be read back with
+    pl.scan_parquet(f"{output_dir}/**/*.parquet"). Row order across partitions is
+    not guaranteed; sort the scan if it matters.
+
+    Args:
+        parameters (dict): Mapping of cost parameter name to an array of values to sweep.
+        chunk_size (int, optional): Number of grid points evaluated per chunk. Defaults to 1_000_000.
+        output_dir (str, optional): New or empty directory for the Parquet output. Defaults to None (in memory).
+        partition_by (list, optional): Output column name(s) to partition the Parquet output by. Defaults to None.
+        executor (str, optional): "serial" or "process" to run the chunks as shards on a process pool. Defaults to "serial".
+        n_workers (int, optional): Number of worker processes for executor="process". Defaults to os.cpu_count().
+        max_points_in_memory (int, optional): Largest grid evaluated without output_dir. Defaults to 5_000_000 (None for no limit).
+        column_names (dict, optional): Output column name per swept parameter. Defaults to None (the parameter names).
+        **kwargs: Scalar values for the remaining cost parameters.
+
+    Returns:
+        pl.LazyFrame: The sweep results with cost_no_growth, cost_with_growth and one column per swept parameter.
+    """
+    
+    n_points = int(np.prod([np.size(value) for value in parameters.values()]))
+    
+    if output_dir is None and max_points_in_memory is not None and n_points > max_points_in_memory:
+        raise ValueError(
+            f"The sweep has {n_points:,} grid points, more than max_points_in_memory={max_points_in_memory:,}. "
+            "Pass output_dir to stream it to Parquet with bounded memory."
+        )
+    
+    columns = [
+        "cost_no_growth",
+        "cost_with_growth",
+        *[(column_names or {}).get(name, name) for name in parameters]
+    ]
+    
+    partition_by = [partition_by] if isinstance(partition_by, str) else list(partition_by or [])
+    
+    unknown = [column for column in partition_by if column not in columns[2:]]
+    if unknown:
+        raise ValueError(f"partition_by must name swept columns {columns[2:]}, got {unknown}.")
+    
+    if output_dir is not None:
+        # old files would silently be scanned together with the new ones
+        if os.path.isdir(output_dir) and os.listdir(output_dir):
+            raise ValueError(f"output_dir {output_dir!r} is not empty.")
+        os.makedirs(output_dir, exist_ok = True)
+    
+    chunks = _cost_sweep_chunks(
+        parameters,
+        chunk_size = chunk_size,
+        executor = executor,
+        n_workers = n_workers,
+        column_names = column_names,
+        output_dir = output_dir,
+        partition_by = partition_by,
+        **kwargs
+    )
+    
+    if output_dir is None:
+        return pl.concat(list(chunks)).lazy()
+    
+    # drain the generator: every shard is written as it is computed
+    for _ in chunks:
+        pass
+    
+    # partition columns come back from the directory names; restore the column order
+    return pl.scan_parquet(
+        os.path.join(output_dir, *["*"] * len(partition_by), "*.parquet"),
+        hive_partitioning = bool(partition_by)
+    ).select(columns)
+
+@_cost_cached
 def cost_simulate_unsub_costs(
     email_list_monthly_growth_rate : float = [0, 0.35],
     customer_conversion_rate : float = [0.04, 0.05, 0.06],
+    executor : str = "serial",
+    n_workers : int = None,
+    output_dir : str = None,
     **kwargs
 ):
     """
     Simulates the unsubscribed costs based on the email list monthly growth rate and customer conversion rate.
 
+    The whole (growth rate x conversion rate) grid is evaluated in a single NumPy
+    broadcast, with the period sums taken in closed form, instead of building one
+    cost table per grid point. With output_dir the results are instead streamed
+    chunk by chunk into a Parquet dataset partitioned by growth rate, and a lazy
+    scan of that dataset is returned, so peak memory stays flat for any grid size.
+    Without output_dir, grids over 5_000_000 points raise a ValueError.
+
     Args:
         email_list_monthly_growth_rate (float, optional): A list of email list monthly growth rates. Defaults to [0, 0.35].
         customer_conversion_rate (float, optional): A list of customer conversion rates. Defaults to [0.04, 0.05, 0.06].
-        **kwargs: Additional keyword arguments.
+        executor (str, optional): "serial" or "process" to shard the grid over a process pool. Defaults to "serial".
+        n_workers (int, optional): Number of worker processes for executor="process". Defaults to os.cpu_count().
+        output_dir (str, optional): New or empty directory of the partitioned Parquet dataset to stream results into. Defaults to None (in memory).
+        **kwargs: Additional keyword arguments passed to cost_calc_monthly_cost_table.
 
     Returns:
-        DataFrame: A DataFrame containing the simulation results with unsubscribed costs.
+        DataFrame: A DataFrame containing the simulation results with unsubscribed costs (pl.LazyFrame when output_dir is given).
     """
     
-    data_dict = {
-        "email_list_monthly_growth_rate": email_list_monthly_growth_rate,
-        "customer_conversion_rate": customer_conversion_rate,
+    parameters = {
+        "email_list_growth_rate": np.asarray(email_list_monthly_growth_rate, dtype = float),
+        "customer_conversion_rate": np.asarray(customer_conversion_rate, dtype = float),
     }
+    
+    # renamed before writing, so the files match the returned column names
+    simulation_results_lf = cost_sweep_unsub_costs(
+        parameters,
+        output_dir = output_dir,
+        partition_by = None if output_dir is None else "email_list_monthly_growth_rate",
+        executor = executor,
+        n_workers = n_workers,
+        column_names = {"email_list_growth_rate": "email_list_monthly_growth_rate"},
+        **kwargs
+    )
+    
+    if output_dir is not None:
+        return simulation_results_lf
+    
+    return simulation_results_lf.collect()
 
-    parameter_grid = (
-        pl.from_pandas(jn.expand_grid(others = data_dict))
-        .rename(
-            {
-                "('email_list_monthly_growth_rate', 0)": "email_list_monthly_growth_rate",
-                "('customer_conversion_rate', 0)": "customer_conversion_rate"
-            }
-        )
+def _cost_draw_prior(rng: np.random.Generator, prior, n_draws: int):
+    """
+    Draws n_draws samples from a prior spec: a scalar (fixed value),
+    ("beta", alpha, beta) or ("normal", mean, sd).
+    """
+    
+    if np.isscalar(prior):
+        return np.full(n_draws, prior, dtype = float)
+    
+    distribution, *args = prior
+    
+    if distribution == "beta":
+        return rng.beta(*args, size = n_draws)
+    if distribution == "normal":
+        return rng.normal(*args, size = n_draws)
+    
+    raise ValueError(f"Unknown prior distribution {distribution!r}. Expected 'beta' or 'normal'.")
+
+def cost_simulate_unsub_costs_mc(
+    n_draws: int = 10_000,
+    priors: dict = None,
+    percentiles: tuple = (5, 50, 95),
+    seed: int = None,
+    max_bytes: int = 64 * 2**20,
+    **kwargs
+):
+    """
+    Monte Carlo simulation of the monthly unsubscribed costs under parameter uncertainty.
+
+    Each cost parameter in priors is drawn n_draws times in one batched NumPy call,
+    and the per-period costs of all draws are evaluated as a (periods x draws) array.
+    The period axis is processed in blocks of one reused buffer of at most
+    max_bytes: powers, products and percentile partitioning all happen in place,
+    so no block-sized temporaries are made. The draws themselves (a few arrays of
+    n_draws floats) are not part of the budget, and a block always holds at least
+    one period.
+
+    Args:
+        n_draws (int, optional): Number of Monte Carlo draws. Defaults to 10_000.
+        priors (dict, optional): Mapping of cost parameter name to a prior: a scalar, ("beta", alpha, beta) or ("normal", mean, sd). Defaults to DEFAULT_COST_PRIORS.
+        percentiles (tuple, optional): Percentiles reported per period. Defaults to (5, 50, 95).
+        seed (int, optional): Seed for np.random.default_rng, for reproducible runs. Defaults to None.
+        max_bytes (int, optional): Memory budget for the (periods x draws) cost block. Defaults to 64 MB.
+        **kwargs: Fixed values for the remaining cost parameters.
+
+    Returns:
+        pl.DataFrame: One row per period with cost_no_growth_p<q> and cost_with_growth_p<q> columns.
+    """
+    
+    priors = DEFAULT_COST_PRIORS if priors is None else priors
+    
+    unknown = set(priors) - set(COST_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown cost parameters: {sorted(unknown)}. Expected any of {COST_PARAMETERS}.")
+    
+    if "n_periods" in priors:
+        raise ValueError("n_periods cannot be drawn from a prior.")
+    
+    rng = np.random.default_rng(seed)
+    
+    # draw every uncertain parameter in one batch (sorted for a stable draw order)
+    params = {name: _cost_draw_prior(rng, priors[name], n_draws) for name in sorted(priors)}
+    params = {**kwargs, **params}
+    
+    n_periods = params.pop("n_periods", 12)
+    email_list_size = params.get("email_list_size", 1e5)
+    email_list_growth_rate = params.get("email_list_growth_rate", 0.035)
+    
+    # per-period cost of one period at unit list size, i.e. cost per subscriber
+    _, cost_per_subscriber = _cost_unsub_totals(
+        **{**params, "email_list_size": 1, "email_list_growth_rate": 0},
+        n_periods = 1
     )
     
-    # temporary function
-    def temporary_function(x, y):
+    cost_no_growth = np.broadcast_to(email_list_size * cost_per_subscriber, (n_draws,))
+    
+    # cost_no_growth is the same in every period
+    no_growth_bands = np.percentile(cost_no_growth, percentiles)
+    
+    growth_base = np.broadcast_to(1 + np.asarray(email_list_growth_rate, dtype = float), (n_draws,))
+    
+    block_periods = max(1, min(n_periods, max_bytes // (8 * n_draws)))
     
-        cost_table_df = cost_calc_monthly_cost_table(
-            email_list_growth_rate = x,
-            customer_conversion_rate = y,
-            **kwargs
+    # one row per period, so each row is a contiguous run of draws
+    block = np.empty((block_periods, n_draws))
+    
+    with_growth_bands = []
+    for start in range(0, n_periods, block_periods):
+        
+        period = np.arange(start, min(start + block_periods, n_periods), dtype = float)
+        cost_with_growth = block[:period.size]
+        
+        np.power(growth_base, period[:, None], out = cost_with_growth)
+        np.multiply(cost_with_growth, cost_no_growth, out = cost_with_growth)
+        
+        # overwrite_input partitions the block in place instead of copying it
+        with_growth_bands.append(
+            np.percentile(cost_with_growth, percentiles, axis = 1, overwrite_input = True)
         )
+    
+    with_growth_bands = (
+        np.concatenate(with_growth_bands, axis = 1) if with_growth_bands
+        else np.empty((len(percentiles), 0))
+    )
+    
+    cost_bands_df = pl.DataFrame(
+        {
+            "period": np.arange(0, n_periods),
+            **{
+                f"cost_no_growth_p{q:g}": np.full(n_periods, band)
+                for q, band in zip(percentiles, no_growth_bands)
+            },
+            **{
+                f"cost_with_growth_p{q:g}": band
+                for q, band in zip(percentiles, with_growth_bands)
+            }
+        }
+    )
+    
+    return cost_bands_df
 
-        summary_df = cost_total_unsub_cost(cost_table_df)
-
-        return summary_df
+def _cost_pool_blocks(values: np.ndarray, block_shape: tuple, pooling: str = "mean"):
+    """
+    Pools a 2D array over non-overlapping blocks of block_shape, padding the
+    trailing edge with NaN so partial blocks are pooled over their real cells.
+    A 1D array is pooled along its only axis when block_shape has one element.
+    """
+    
+    pad = [(0, -(-n // b) * b - n) for n, b in zip(values.shape, block_shape)]
+    padded = np.pad(values.astype(float), pad, constant_values = np.nan)
     
-    # list comprehension
-    summary_list = [temporary_function(x, y) for x, y 
-                    in zip(parameter_grid["email_list_monthly_growth_rate"], 
-                           parameter_grid["customer_conversion_rate"])]
+    # (rows, block_rows, cols, block_cols) -> pool over the block axes
+    blocked_shape = []
+    for n, b in zip(padded.shape, block_shape):
+        blocked_shape += [n // b, b]
+    blocked = padded.reshape(blocked_shape)
+    block_axes = tuple(range(1, blocked.ndim, 2))
     
-    # concatenate summary list
-    simulation_results_df = pl.concat(summary_list).hstack(parameter_grid)
+    if pooling == "mean":
+        return np.nanmean(blocked, axis = block_axes)
+    if pooling == "max":
+        return np.nanmax(blocked, axis = block_axes)
     
-    return simulation_results_df
+    raise ValueError(f"pooling must be 'mean' or 'max', got {pooling!r}.")
 
-def cost_plot_simulated_unsub_cost(simulation_results: pl.DataFrame):
+def cost_plot_simulated_unsub_cost(
+    simulation_results: pl.DataFrame,
+    max_resolution: tuple = (200, 300),
+    pooling: str = "mean"
+):
     """
     Plot the cost of unsubscription based on simulated results.
 
+    Each grid point is binned to its heatmap cell by its growth rate and
+    conversion rate index, and the cells are pooled with a lazy group-by, so
+    only the axis values and the pooled cells are ever collected. Dense sweeps,
+    including the LazyFrame scans streamed to disk by cost_simulate_unsub_costs
+    with an output_dir, are plotted without materializing them, and the heatmap
+    never carries more than max_resolution cells, which keeps the figure payload
+    bounded. Grids within the limit are plotted one cell per grid point.
+
     Args:
-        simulation_results (pl.DataFrame): DataFrame containing simulation results.
+        simulation_results (pl.DataFrame | pl.LazyFrame): Simulation results, one row per growth rate x conversion rate pair.
+        max_resolution (tuple, optional): Maximum (rows, columns) of the heatmap, or None for one cell per grid point. Defaults to (200, 300).
+        pooling (str, optional): "mean" or "max" pooling of the cells in each block. Defaults to "mean".
 
     Returns:
         plotly.graph_objects.Figure: Plotly figure object representing the cost plot.
     """
     
-    simulations_results_wide_df = simulation_results \
-    .drop("cost_no_growth") \
-    .pivot(
-        index = "email_list_monthly_growth_rate",
-        columns = "customer_conversion_rate",
-        values = "cost_with_growth"
+    if pooling not in ("mean", "max"):
+        raise ValueError(f"pooling must be 'mean' or 'max', got {pooling!r}.")
+    
+    simulation_lf = simulation_results.lazy()
+    
+    growth_df, conversion_df, count_df = pl.collect_all([
+        simulation_lf.select(pl.col("email_list_monthly_growth_rate").unique().sort()),
+        simulation_lf.select(pl.col("customer_conversion_rate").unique().sort()),
+        simulation_lf.select(pl.len()),
+    ])
+    
+    growth_rate = growth_df.to_series().to_numpy()
+    conversion_rate = conversion_df.to_series().to_numpy()
+    
+    if growth_rate.size * conversion_rate.size != count_df.item():
+        raise ValueError("simulation_results must contain exactly one row per growth rate x conversion rate pair.")
+    
+    if max_resolution is None:
+        block_shape = (1, 1)
+    else:
+        block_shape = (
+            max(1, -(-growth_rate.size // max_resolution[0])),
+            max(1, -(-conversion_rate.size // max_resolution[1]))
+        )
+    
+    # heatmap row / column of each axis value
+    growth_bins = pl.DataFrame({
+        "email_list_monthly_growth_rate": growth_rate,
+        "row": np.arange(growth_rate.size) // block_shape[0],
+    }).lazy()
+    conversion_bins = pl.DataFrame({
+        "customer_conversion_rate": conversion_rate,
+        "col": np.arange(conversion_rate.size) // block_shape[1],
+    }).lazy()
+    
+    cost = pl.col("cost_with_growth")
+    
+    cells_df = (
+        simulation_lf
+        .select("email_list_monthly_growth_rate", "customer_conversion_rate", "cost_with_growth")
+        .join(growth_bins, on = "email_list_monthly_growth_rate")
+        .join(conversion_bins, on = "customer_conversion_rate")
+        .group_by("row", "col")
+        .agg(cost.mean() if pooling == "mean" else cost.max())
+        .collect()
     )
     
+    cost_grid = np.full(
+        (-(-growth_rate.size // block_shape[0]), -(-conversion_rate.size // block_shape[1])),
+        np.nan
+    )
+    cost_grid[cells_df["row"].to_numpy(), cells_df["col"].to_numpy()] = cells_df["cost_with_growth"].to_numpy()
+    
+    # axis labels are the mean rate of each block
+    growth_rate = _cost_pool_blocks(growth_rate, block_shape[:1])
+    conversion_rate = _cost_pool_blocks(conversion_rate, block_shape[1:])
+    
     plot = px.imshow(
-        simulations_results_wide_df.to_pandas().set_index("email_list_monthly_growth_rate"),
+        cost_grid,
+        x = conversion_rate,
+        y = growth_rate,
         origin = "lower",
         aspect = 'auto',
         title = "Lead Cost Simulation",
@@ -190,4 +947,4 @@ def cost_plot_simulated_unsub_cost(simulation_results: pl.DataFrame):
                       color = "Cost of Unsubscription")
     )
     
-    return plot
\ No newline at end of file
+    return plot
@@ -1,86 +1,546 @@
+import os
+import json
+import hashlib
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 import polars as pl
 import polars.selectors as cs
 import sqlalchemy as sql
 
-def db_read_els_data(
+# ENGINE REGISTRY ----
+
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+def _db_engine_kwargs(pool_size: int = None, max_overflow: int = None, pool_pre_ping: bool = True):
+    # pool settings shared by the sync and async engines, None leaves the dialect default
+    engine_kwargs = {"pool_pre_ping": pool_pre_ping}
+    if pool_size is not None:
+        engine_kwargs["pool_size"] = pool_size
+    if max_overflow is not None:
+        engine_kwargs["max_overflow"] = max_overflow
+    return engine_kwargs
+
+def db_get_engine(
     conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    pool_size: int = None,
+    max_overflow: int = None,
+    pool_pre_ping: bool = True
 ):
-    """Reads raw data from the database and combines it into a single dataframe
+    """Returns the process-wide pooled engine for a connection string, creating it on first use
+
+    The pool settings only apply when the engine is created. To change them for an
+    existing connection string, dispose it first with db_dispose_engines(conn_string).
 
     Args:
-        conn_string (string, required): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        conn_string (string, optional): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        pool_size (int, optional): Number of pooled connections. Defaults to None (SQLAlchemy default for the dialect).
+        max_overflow (int, optional): Connections allowed beyond pool_size. Defaults to None (SQLAlchemy default).
+        pool_pre_ping (bool, optional): Test connections for liveness on checkout. Defaults to True.
 
     Returns:
-        polars DataFrame: Combined raw data
+        sqlalchemy Engine: Shared engine for conn_string
     """
-    # connect to engine
-    engine = sql.create_engine(conn_string)
-    
-    # raw data collect
-    with engine.connect() as conn:
+    with _ENGINES_LOCK:
         
-        # subscribers
-        subscribers_df = (
-            pl.read_database('SELECT * FROM Subscribers', conn)
-            .with_columns(
-                pl.col("mailchimp_id").cast(pl.Int64),
-                pl.col("member_rating").cast(pl.Int8),
-                pl.col("optin_time").cast(pl.Date)
-            )
-        )
+        engine = _ENGINES.get(conn_string)
         
-        # tags
-        tags_df = (
-            pl.read_database('SELECT * FROM Tags', conn)
-            .with_columns(
-                pl.col("mailchimp_id").cast(pl.Int64)
-            )
-        )
+        if engine is None:
+            engine = sql.create_engine(conn_string, **_db_engine_kwargs(pool_size, max_overflow, pool_pre_ping))
+            _ENGINES[conn_string] = engine
         
-        # transactions
-        transactions_df = (
-            pl.read_database('SELECT * FROM Transactions', conn)
-            .with_columns(
-                pl.col("product_id").cast(pl.Int64),
-                pl.col("purchased_at").cast(pl.Date),
-            )
-        )
+    return engine
+
+def db_dispose_engines(conn_string: str = None):
+    """Disposes pooled engines and removes them from the registry
+
+    Args:
+        conn_string (string, optional): Only dispose the engine for this connection string. Defaults to None (all engines).
+    """
+    with _ENGINES_LOCK:
         
-        # merge tag counts 
-        user_events_df = (
-            tags_df
-            .group_by("mailchimp_id")
-            .agg(
-                pl.count("tag").alias("tag_count")
-            )
-        )
+        conn_strings = list(_ENGINES) if conn_string is None else [conn_string]
+        
+        for key in conn_strings:
+            engine = _ENGINES.pop(key, None)
+            if engine is not None:
+                _db_forget_catalog(engine)
+                engine.dispose()
+
+def _db_reset_engines_after_fork():
+    # a forked worker must not reuse the parent's pooled connections: drop the
+    # inherited pools without closing the parent's sockets, and start afresh
+    global _ENGINES_LOCK, _CATALOGS_LOCK
+    _ENGINES_LOCK = threading.Lock()
+    _CATALOGS_LOCK = threading.Lock()
+    
+    for engine in _ENGINES.values():
+        engine.dispose(close = False)
+    
+    _ENGINES.clear()
+    _CATALOGS.clear()
+    _STATEMENTS.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child = _db_reset_engines_after_fork)
+
+# CATALOG ----
+
+# reflected MetaData per engine, and the select() statements built from it; the
+# same statement objects are reused so SQLAlchemy's compiled cache hits
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+_STATEMENTS = {}
+
+def db_get_els_catalog(
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    refresh: bool = False,
+):
+    """Returns the reflected table catalog of the database, reflecting it once per engine
+
+    Args:
+        conn_string (string, optional): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        refresh (bool, optional): Reflect again, e.g. after tables were added. Defaults to False.
+
+    Returns:
+        sqlalchemy MetaData: Reflected tables
+    """
+    return _db_get_catalog(db_get_engine(conn_string), refresh = refresh)
+
+def _db_get_catalog(bind, refresh: bool = False):
+    # bind is an engine or a connection; catalogs are keyed by its engine
+    engine = bind.engine
+    
+    if refresh:
+        _db_forget_catalog(engine)
+    
+    metadata = _CATALOGS.get(engine)
+    
+    if metadata is None:
+        # reflect without holding the lock: under the async engine reflection
+        # yields to the event loop, and a blocked lock would stall the loop
+        metadata = sql.MetaData()
         
-        subscribers_joined_df = (
-            subscribers_df
-            .join(user_events_df, on = "mailchimp_id", how = "left")
-            .with_columns(
-                pl.col("tag_count").fill_null(0)
+        # the expression indexes created by db_maintain_els_database are not
+        # needed in the catalog; SQLAlchemy warns on every reflection that it
+        # skips them. Only silenced here, not for the rest of the process
+        with warnings.catch_warnings():
+            warnings.filterwarnings(
+                "ignore",
+                message = "Skipped unsupported reflection of expression-based index",
+                category = sql.exc.SAWarning
             )
-        )
+            metadata.reflect(bind = bind)
         
-        # merge the target variable  
+        with _CATALOGS_LOCK:
+            metadata = _CATALOGS.setdefault(engine, metadata)
+    
+    return metadata
+
+def _db_forget_catalog(engine, locked: bool = False):
+    if not locked:
+        with _CATALOGS_LOCK:
+            return _db_forget_catalog(engine, locked = True)
+    
+    _CATALOGS.pop(engine, None)
+    for key in [key for key in _STATEMENTS if key[0] is engine]:
+        del _STATEMENTS[key]
+
+def _db_get_table(bind, table: str):
+    # validates the table name against the reflected catalog; tables created
+    # after reflection need an explicit db_get_els_catalog(refresh=True)
+    tables = _db_get_catalog(bind).tables
+    
+    if table not in tables:
+        raise ValueError(f"Unknown table {table!r}. Available tables: {sorted(tables)}. Tables created since the catalog was reflected need db_get_els_catalog(refresh=True)")
+    
+    return tables[table]
+
+def _db_check_materialized(bind):
+    # asks the database directly, so it neither depends on nor refreshes the catalog
+    if not sql.inspect(bind).has_table("subscriber_features"):
+        raise ValueError("subscriber_features does not exist; run db_maintain_els_database before reading with materialized=True")
+
+def _db_get_columns(table_obj, columns: list):
+    # validates column names against the reflected catalog
+    unknown = [name for name in columns if name not in table_obj.c]
+    
+    if unknown:
+        raise ValueError(f"Unknown columns {unknown} in table {table_obj.name!r}. Available columns: {list(table_obj.c.keys())}")
+    
+    return [table_obj.c[name] for name in columns]
+
+# DECLARED SCHEMAS ----
+
+# final dtypes of the columns the package reads from each CRM table
+ELS_SCHEMAS = {
+    "Subscribers": {
+        "mailchimp_id": pl.Int64,
+        "user_full_name": pl.Utf8,
+        "user_email": pl.Utf8,
+        "member_rating": pl.Int8,
+        "optin_time": pl.Date,
+        "country_code": pl.Categorical,
+    },
+    "Tags": {
+        "mailchimp_id": pl.Int64,
+        "tag": pl.Categorical,
+    },
+    "Transactions": {
+        "user_email": pl.Utf8,
+        "purchased_at": pl.Date,
+        "product_id": pl.Int64,
+    },
+}
+
+_INTEGER_DTYPES = (pl.Int8, pl.Int16, pl.Int32, pl.Int64)
+
+def _db_typed_select(conn, table: str, columns: list):
+    """Builds a projected SELECT that decodes columns straight into their ELS_SCHEMAS dtypes
+
+    Integers are cast in SQL and SQLite text dates are converted to days since the
+    epoch, so polars only has to reinterpret them as Date instead of parsing strings.
+
+    Returns:
+        tuple: (select statement, schema_overrides, date columns to reinterpret)
+    """
+    key = (conn.engine, table, tuple(columns))
+    
+    if key in _STATEMENTS:
+        return _STATEMENTS[key]
+    
+    schema = ELS_SCHEMAS[table]
+    is_sqlite = conn.engine.url.get_backend_name() == "sqlite"
+    
+    table_columns = _db_get_columns(_db_get_table(conn, table), columns)
+    
+    selected, schema_overrides, date_columns = [], {}, []
+    
+    for name, column in zip(columns, table_columns):
+        dtype = schema[name]
         
-        emails_made_purchase = transactions_df['user_email'].unique()
+        if dtype in _INTEGER_DTYPES:
+            column = sql.cast(column, sql.Integer).label(name)
+            schema_overrides[name] = dtype
+        elif dtype == pl.Date and is_sqlite:
+            column = sql.cast(sql.func.julianday(column) - 2440587.5, sql.Integer).label(name)
+            schema_overrides[name] = pl.Int32
+            date_columns.append(name)
+        else:
+            schema_overrides[name] = dtype
         
-        subscribers_joined_df = (
-            subscribers_joined_df
-            .with_columns(
-                pl.when(pl.col("user_email").is_in(emails_made_purchase))
-                .then(1)
-                .otherwise(0)
-                .alias("made_purchase")
-            )
+        selected.append(column)
+    
+    _STATEMENTS[key] = (sql.select(*selected), schema_overrides, date_columns)
+    
+    return _STATEMENTS[key]
+
+# READERS ----
+
+# the Subscribers columns of ELS_SCHEMAS, so the SQL paths return the same
+# projection as the raw table reads
+_ELS_SUBSCRIBER_COLUMNS = ",\n    ".join(f"s.{name}" for name in ELS_SCHEMAS["Subscribers"])
+
+# tag counts, join and purchase flag evaluated by the database, so only one
+# row per subscriber is transferred
+_ELS_PUSHDOWN_QUERY = f"""
+SELECT
+    {_ELS_SUBSCRIBER_COLUMNS},
+    COALESCE(t.tag_count, 0) AS tag_count,
+    CASE WHEN EXISTS (
+        SELECT 1 FROM Transactions tr WHERE tr.user_email = s.user_email
+    ) THEN 1 ELSE 0 END AS made_purchase
+FROM Subscribers s
+LEFT JOIN (
+    SELECT CAST(mailchimp_id AS INTEGER) AS mailchimp_id, COUNT(tag) AS tag_count
+    FROM Tags
+    GROUP BY CAST(mailchimp_id AS INTEGER)
+) t
+    ON t.mailchimp_id = CAST(s.mailchimp_id AS INTEGER)
+"""
+
+# tag counts and purchase flags read from the subscriber_features table kept by
+# db_maintain_els_database: one rowid lookup per subscriber, no aggregation.
+# Subscribers added since the last maintenance run have no features row; they
+# are kept and aggregated from Tags and Transactions instead
+_ELS_MATERIALIZED_QUERY = f"""
+SELECT
+    {_ELS_SUBSCRIBER_COLUMNS},
+    COALESCE(f.tag_count, (
+        SELECT COUNT(t.tag) FROM Tags t
+        WHERE CAST(t.mailchimp_id AS INTEGER) = CAST(s.mailchimp_id AS INTEGER)
+    )) AS tag_count,
+    COALESCE(f.made_purchase, EXISTS (
+        SELECT 1 FROM Transactions tr WHERE tr.user_email = s.user_email
+    )) AS made_purchase
+FROM Subscribers s
+LEFT JOIN subscriber_features f
+    ON f.subscriber_rowid = s.rowid
+"""
+
+# TABLE CACHE ----
+
+# content checksum of a whole table per backend; changes on any insert, update
+# or delete, unlike a row count
+_TABLE_CHECKSUM_QUERIES = {
+    "postgresql": "SELECT md5(string_agg(md5(t::text), '' ORDER BY md5(t::text))) FROM {table} t",
+    "mysql": "CHECKSUM TABLE {table}",
+    "mssql": "SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {table}",
+}
+
+# bytes of the SQLite file headers that change on every write: the database
+# file change counter (rollback journal mode) and the WAL checkpoint sequence
+# and salts (WAL mode, where commits append frames and grow the file)
+_SQLITE_HEADER_MARKS = {"": slice(24, 28), "-wal": slice(12, 24)}
+
+def _db_file_fingerprint(url, table: str, columns: list = None):
+    # SQLite file databases are fingerprinted by file mtime/size and header
+    # change marks (including the WAL file), without a query; None for any other
+    # database. Mtimes alone are too coarse for writes right after a read. The
+    # driver is dropped from the URL, so sync and async reads share the cache
+    backend = url.get_backend_name()
+    
+    if backend != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    
+    fingerprint = {"database": url.set(drivername = backend).render_as_string(hide_password = True), "table": table, "columns": columns}
+    
+    for suffix, header_marks in _SQLITE_HEADER_MARKS.items():
+        path = url.database + suffix
+        if os.path.exists(path):
+            stat = os.stat(path)
+            with open(path, "rb") as f:
+                header = f.read(32)
+            fingerprint[path] = [stat.st_mtime_ns, stat.st_size, header[header_marks].hex()]
+    
+    return fingerprint
+
+def _db_table_fingerprint(conn, table: str, columns: list = None):
+    # file fingerprint for SQLite, a table checksum query for PostgreSQL, MySQL
+    # and SQL Server. Anything else returns None: not cacheable, rather than
+    # served stale
+    url = conn.engine.url
+    backend = url.get_backend_name()
+    
+    fingerprint = _db_file_fingerprint(url, table, columns)
+    
+    if fingerprint is not None or backend not in _TABLE_CHECKSUM_QUERIES:
+        return fingerprint
+    
+    fingerprint = {"database": url.set(drivername = backend).render_as_string(hide_password = True), "table": table, "columns": columns}
+    
+    # the name is validated against the catalog before it is quoted into SQL
+    quoted_table = conn.dialect.identifier_preparer.quote(_db_get_table(conn, table).name)
+    
+    checksum = conn.execute(
+        sql.text(_TABLE_CHECKSUM_QUERIES[backend].format(table = quoted_table))
+    ).first()[-1]
+    
+    fingerprint["checksum"] = None if checksum is None else str(checksum)
+    
+    return fingerprint
+
+def _db_table_select(conn, table: str, columns: list = None):
+    # raw SELECT * without columns, otherwise the typed projection of ELS_SCHEMAS
+    if columns is None:
+        key = (conn.engine, table, None)
+        if key not in _STATEMENTS:
+            _STATEMENTS[key] = (sql.select(_db_get_table(conn, table)), None, [])
+        return _STATEMENTS[key]
+    
+    return _db_typed_select(conn, table, columns)
+
+def _db_query_table(conn, table: str, columns: list = None):
+    statement, schema_overrides, date_columns = _db_table_select(conn, table, columns)
+    
+    df = pl.read_database(statement, conn, schema_overrides = schema_overrides)
+    
+    return df.with_columns(pl.col(date_columns).cast(pl.Date)) if date_columns else df
+
+def _db_frame_from_rows(column_names: list, rows: list, schema_overrides: dict = None, date_columns: list = ()):
+    # the row decoding of pl.read_database, for rows fetched elsewhere
+    df = pl.DataFrame(
+        [tuple(row) for row in rows],
+        schema = column_names,
+        schema_overrides = schema_overrides,
+        orient = "row",
+        infer_schema_length = None
+    )
+    
+    return df.with_columns(pl.col(date_columns).cast(pl.Date)) if date_columns else df
+
+def _db_cache_paths(cache_dir: str, table: str, columns: list = None):
+    # one .arrow / .json pair per table and column projection
+    cache_name = table if columns is None else (
+        f"{table}-{hashlib.sha1(json.dumps(columns).encode()).hexdigest()[:12]}"
+    )
+    
+    return os.path.join(cache_dir, f"{cache_name}.arrow"), os.path.join(cache_dir, f"{cache_name}.json")
+
+def _db_cache_load(cache_path: str, fingerprint_path: str, fingerprint: dict):
+    # the cached frame, or None when it is missing or stale
+    if os.path.exists(cache_path) and os.path.exists(fingerprint_path):
+        with open(fingerprint_path) as f:
+            if json.load(f) == fingerprint:
+                return pl.read_ipc(cache_path, memory_map = True)
+    
+    return None
+
+def _db_cache_store(df: pl.DataFrame, cache_path: str, fingerprint_path: str, fingerprint: dict):
+    os.makedirs(os.path.dirname(cache_path), exist_ok = True)
+    df.write_ipc(cache_path + ".tmp")
+    os.replace(cache_path + ".tmp", cache_path)
+    with open(fingerprint_path, "w") as f:
+        json.dump(fingerprint, f)
+
+def _db_read_table(conn, table: str, columns: list = None, cache_dir: str = None):
+    """Reads a table, through the Arrow IPC cache in cache_dir when given
+
+    Cached tables are stored uncompressed as {table}.arrow (all columns) or
+    {table}-{projection digest}.arrow, with the database fingerprint in a .json
+    file next to it, and read back memory mapped. Each projection has its own
+    files, so raw and projected reads of a table do not evict each other.
+    """
+    if cache_dir is None:
+        return _db_query_table(conn, table, columns)
+    
+    fingerprint = _db_table_fingerprint(conn, table, columns)
+    
+    if fingerprint is None:
+        return _db_query_table(conn, table, columns)
+    
+    cache_path, fingerprint_path = _db_cache_paths(cache_dir, table, columns)
+    
+    df = _db_cache_load(cache_path, fingerprint_path, fingerprint)
+    
+    if df is None:
+        df = _db_query_table(conn, table, columns)
+        _db_cache_store(df, cache_path, fingerprint_path, fingerprint)
+    
+    return df
+
+def _db_cast_els_data(df: pl.DataFrame):
+    # dtypes of the combined subscriber frame produced by db_read_els_data
+    return df.with_columns(
+        *[pl.col(name).cast(dtype) for name, dtype in ELS_SCHEMAS["Subscribers"].items()],
+        pl.col("tag_count").cast(pl.Int64),
+        pl.col("made_purchase").cast(pl.Int32)
+    )
+
+# columns of each table needed to build the combined subscriber frame
+_ELS_DATA_COLUMNS = {
+    "Subscribers": list(ELS_SCHEMAS["Subscribers"]),
+    "Tags": ["mailchimp_id", "tag"],
+    "Transactions": ["user_email"],
+}
+
+def _db_read_table_pooled(engine, table: str, columns: list = None, cache_dir: str = None):
+    # checks out its own pooled connection, so it can run on a worker thread
+    with engine.connect() as conn:
+        return _db_read_table(conn, table, columns, cache_dir)
+
+def _db_combine_els_data(
+    subscribers_df: pl.DataFrame,
+    tags_df: pl.DataFrame,
+    transactions_df: pl.DataFrame,
+):
+    # merge tag counts 
+    user_events_df = (
+        tags_df
+        .group_by("mailchimp_id")
+        .agg(
+            pl.count("tag").alias("tag_count")
         )
+    )
+    
+    subscribers_joined_df = (
+        subscribers_df
+        .join(user_events_df, on = "mailchimp_id", how = "left")
+        .with_columns(
+            pl.col("tag_count").fill_null(0)
+        )
+    )
+    
+    # merge the target variable  
+    
+    emails_made_purchase = transactions_df['user_email'].unique()
+    
+    subscribers_joined_df = (
+        subscribers_joined_df
+        .with_columns(
+            pl.when(pl.col("user_email").is_in(emails_made_purchase))
+            .then(1)
+            .otherwise(0)
+            .alias("made_purchase")
+        )
+    )
+    
+    return subscribers_joined_df
+
+def db_read_els_data(
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    pushdown: bool = False,
+    cache_dir: str = None,
+    concurrent: bool = False,
+    materialized: bool = False,
+):
+    """Reads raw data from the database and combines it into a single dataframe
+
+    Args:
+        conn_string (string, required): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        pushdown (bool, optional): Compute tag counts, the join and made_purchase in a single SQL query instead of in polars. Defaults to False.
+        cache_dir (string, optional): Directory of the local Arrow cache for the raw tables, invalidated when the database changes. Defaults to None (no cache).
+        concurrent (bool, optional): Read Subscribers, Tags and Transactions in parallel on a thread pool, one pooled connection each. Defaults to False.
+        materialized (bool, optional): Read tag_count and made_purchase from the subscriber_features table instead of aggregating Tags and Transactions. Features reflect the last db_maintain_els_database run; subscribers added since are aggregated on the fly. Defaults to False.
+
+    Returns:
+        polars DataFrame: Combined raw data
+    """
+    if pushdown and materialized:
+        raise ValueError("pushdown=True and materialized=True are alternative query plans; pick one")
+    
+    if (pushdown or materialized) and (cache_dir is not None or concurrent):
+        raise ValueError("cache_dir and concurrent apply to the raw table reads and cannot be combined with pushdown=True or materialized=True")
+    
+    # shared pooled engine
+    engine = db_get_engine(conn_string)
+    
+    if pushdown or materialized:
+        with engine.connect() as conn:
+            
+            if materialized:
+                _db_check_materialized(conn)
+            
+            subscribers_joined_df = _db_cast_els_data(
+                pl.read_database(_ELS_MATERIALIZED_QUERY if materialized else _ELS_PUSHDOWN_QUERY, conn)
+            )
         
         return subscribers_joined_df
     
+    # raw data collect, decoded into their ELS_SCHEMAS dtypes
+    if concurrent:
+        with ThreadPoolExecutor(max_workers = len(_ELS_DATA_COLUMNS)) as pool:
+            futures = {
+                table: pool.submit(_db_read_table_pooled, engine, table, columns, cache_dir)
+                for table, columns in _ELS_DATA_COLUMNS.items()
+            }
+            tables = {table: future.result() for table, future in futures.items()}
+    else:
+        with engine.connect() as conn:
+            tables = {
+                table: _db_read_table(conn, table, columns, cache_dir)
+                for table, columns in _ELS_DATA_COLUMNS.items()
+            }
+    
+    subscribers_joined_df = _db_combine_els_data(
+        tables["Subscribers"], tables["Tags"], tables["Transactions"]
+    )
+    
+    return subscribers_joined_df
+    
 def db_read_els_table_names(
     conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
 ):
@@ -92,22 +552,402 @@ def db_read_els_table_names(
     Returns:
         list: List of table names
     """
-    # connect to engine
-    engine = sql.create_engine(conn_string)
-    
-    conn = engine.connect()
+    # shared pooled engine and its cached catalog
+    engine = db_get_engine(conn_string)
 
-    table_names = sql.inspect(engine).get_table_names()
+    table_names = sorted(_db_get_catalog(engine).tables)
         
     return table_names
 
 def db_read_raw_els_table(
     table: str = "Products",
     conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    cache_dir: str = None,
+):
+    """Reads a raw table from the database
+
+    Args:
+        table (string, optional): Name of the table. Defaults to "Products".
+        conn_string (string, optional): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        cache_dir (string, optional): Directory of the local Arrow cache, invalidated when the database changes. Defaults to None (no cache).
+
+    Returns:
+        polars DataFrame: Raw table
+    """
+    engine = db_get_engine(conn_string)
+    
+    with engine.connect() as conn:
+        df = _db_read_table(conn, table, cache_dir = cache_dir)
+        
+    return df
+
+def db_iter_raw_els_table(
+    table: str = "Products",
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    batch_size: int = 50_000,
+    columns: list = None,
+    where: str = None,
+    params: dict = None,
 ):
-    engine = sql.create_engine(conn_string)
+    """Streams a raw table from the database in batches
+
+    Rows are fetched through a streaming (server-side where supported) cursor, so
+    only one batch is held in memory at a time. Column dtypes are inferred per batch.
+
+    Args:
+        table (string, optional): Name of the table. Defaults to "Products".
+        conn_string (string, optional): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        batch_size (int, optional): Number of rows per batch. Defaults to 50_000.
+        columns (list, optional): Columns to select. Defaults to None (all columns).
+        where (string, optional): SQL predicate, with :name placeholders for params, e.g. "purchased_at >= :start". Defaults to None.
+        params (dict, optional): Values of the placeholders in where. Defaults to None.
+
+    Yields:
+        polars DataFrame: Batches of at most batch_size rows
+    """
+    engine = db_get_engine(conn_string)
+    
+    table_obj = _db_get_table(engine, table)
+    
+    statement = sql.select(*_db_get_columns(table_obj, columns)) if columns else sql.select(table_obj)
+    
+    if where is not None:
+        statement = statement.where(sql.text(where))
     
     with engine.connect() as conn:
-        df = pl.read_database(f'SELECT * FROM {table}', conn)
         
-    return df
\ No newline at end of file
+        result = (
+            conn
+            .execution_options(stream_results = True, yield_per = batch_size)
+            .execute(statement, params or {})
+        )
+        
+        column_names = list(result.keys())
+        
+        for rows in result.partitions(batch_size):
+            yield _db_frame_from_rows(column_names, rows)
+
+# INCREMENTAL REFRESH ----
+
+# new subscribers (rowid window) with tag counts and purchase flags as of the
+# Tags / Transactions high-water marks
+_ELS_INCREMENTAL_SUBSCRIBERS_QUERY = f"""
+SELECT
+    {_ELS_SUBSCRIBER_COLUMNS},
+    COALESCE(t.tag_count, 0) AS tag_count,
+    CASE WHEN EXISTS (
+        SELECT 1 FROM Transactions tr
+        WHERE tr.user_email = s.user_email AND tr.rowid <= :transactions_hi
+    ) THEN 1 ELSE 0 END AS made_purchase
+FROM Subscribers s
+LEFT JOIN (
+    SELECT CAST(mailchimp_id AS INTEGER) AS mailchimp_id, COUNT(tag) AS tag_count
+    FROM Tags
+    WHERE rowid <= :tags_hi
+      AND CAST(mailchimp_id AS INTEGER) IN (
+          SELECT CAST(mailchimp_id AS INTEGER) FROM Subscribers
+          WHERE rowid > :subscribers_lo AND rowid <= :subscribers_hi
+      )
+    GROUP BY CAST(mailchimp_id AS INTEGER)
+) t
+    ON t.mailchimp_id = CAST(s.mailchimp_id AS INTEGER)
+WHERE s.rowid > :subscribers_lo AND s.rowid <= :subscribers_hi
+"""
+
+_ELS_TAG_DELTA_QUERY = """
+SELECT CAST(mailchimp_id AS INTEGER) AS mailchimp_id, COUNT(tag) AS tag_delta
+FROM Tags
+WHERE rowid > :tags_lo AND rowid <= :tags_hi
+GROUP BY CAST(mailchimp_id AS INTEGER)
+"""
+
+_ELS_TRANSACTION_DELTA_QUERY = """
+SELECT user_email
+FROM Transactions
+WHERE rowid > :transactions_lo AND rowid <= :transactions_hi
+"""
+
+def db_refresh_els_data(
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    snapshot_dir: str = '00_database/els_snapshot',
+    full_refresh: bool = False,
+):
+    """Incrementally refreshes a local snapshot of the combined subscriber data
+
+    The snapshot (subscribers.parquet) is stored with high-water marks
+    (watermarks.json): the max SQLite rowid of Subscribers, Tags and Transactions,
+    which decide what a refresh reads, plus the latest optin_time and purchased_at
+    for reference. A refresh only reads rows past the rowid marks: new
+    subscribers are fetched with their tag counts and purchase flags, new tags
+    increment tag_count and new transactions set made_purchase on the existing
+    rows. Rows updated or deleted in place are not detected; use
+    full_refresh=True to rebuild the snapshot from scratch.
+
+    Args:
+        conn_string (string, optional): Connection string to the SQLite database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        snapshot_dir (string, optional): Directory holding the snapshot and watermarks. Defaults to '00_database/els_snapshot'.
+        full_refresh (bool, optional): Ignore any existing snapshot and rebuild it. Defaults to False.
+
+    Returns:
+        polars DataFrame: Combined raw data, same as db_read_els_data
+    """
+    snapshot_path = os.path.join(snapshot_dir, "subscribers.parquet")
+    watermarks_path = os.path.join(snapshot_dir, "watermarks.json")
+    
+    watermarks = {"Subscribers": 0, "Tags": 0, "Transactions": 0, "max_optin_time": None, "max_purchased_at": None}
+    snapshot_df = None
+    
+    if not full_refresh and os.path.exists(snapshot_path) and os.path.exists(watermarks_path):
+        with open(watermarks_path) as f:
+            watermarks = json.load(f)
+        snapshot_df = pl.read_parquet(snapshot_path)
+    
+    engine = db_get_engine(conn_string)
+    
+    with engine.connect() as conn:
+        
+        # current high-water marks bound every query below, so rows inserted
+        # while refreshing are picked up by the next refresh
+        high_marks = {
+            table: conn.execute(sql.text(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}")).scalar()
+            for table in ("Subscribers", "Tags", "Transactions")
+        }
+        
+        # a table that shrank was rebuilt: start over
+        if snapshot_df is not None and any(high_marks[t] < watermarks[t] for t in high_marks):
+            return db_refresh_els_data(conn_string, snapshot_dir, full_refresh = True)
+        
+        params = {
+            "subscribers_lo": watermarks["Subscribers"], "subscribers_hi": high_marks["Subscribers"],
+            "tags_lo": watermarks["Tags"], "tags_hi": high_marks["Tags"],
+            "transactions_lo": watermarks["Transactions"], "transactions_hi": high_marks["Transactions"],
+        }
+        
+        new_subscribers_df = _db_cast_els_data(
+            pl.read_database(
+                sql.text(_ELS_INCREMENTAL_SUBSCRIBERS_QUERY), conn,
+                execute_options = {"parameters": params}
+            )
+        )
+        
+        # the initial build gets its purchase flags from the subscribers query,
+        # so Transactions is only read past the watermark on incremental refreshes
+        max_purchased_at = conn.execute(
+            sql.text("SELECT MAX(purchased_at) FROM Transactions WHERE rowid <= :transactions_hi"),
+            params
+        ).scalar()
+        
+        if snapshot_df is None:
+            subscribers_joined_df = new_subscribers_df
+        else:
+            tag_delta_df = (
+                pl.read_database(
+                    sql.text(_ELS_TAG_DELTA_QUERY), conn,
+                    execute_options = {"parameters": params}
+                )
+                .with_columns(
+                    pl.col("mailchimp_id").cast(pl.Int64),
+                    pl.col("tag_delta").cast(pl.Int64)
+                )
+            )
+            
+            new_purchases_df = pl.read_database(
+                sql.text(_ELS_TRANSACTION_DELTA_QUERY), conn,
+                execute_options = {"parameters": params}
+            )
+            
+            # update existing subscribers in place
+            snapshot_df = (
+                snapshot_df
+                .join(tag_delta_df, on = "mailchimp_id", how = "left")
+                .with_columns(
+                    (pl.col("tag_count") + pl.col("tag_delta").fill_null(0)).alias("tag_count"),
+                    pl.when(pl.col("user_email").is_in(new_purchases_df["user_email"].drop_nulls().cast(pl.Utf8)))
+                    .then(1)
+                    .otherwise(pl.col("made_purchase"))
+                    .alias("made_purchase")
+                )
+                .drop("tag_delta")
+            )
+            
+            subscribers_joined_df = _db_cast_els_data(
+                # local categoricals of the two frames have different encodings
+                pl.concat(
+                    [
+                        df.with_columns(pl.col(pl.Categorical).cast(pl.Utf8))
+                        for df in (snapshot_df, new_subscribers_df)
+                    ],
+                    how = "vertical_relaxed"
+                )
+            )
+    
+    max_optin_time = subscribers_joined_df["optin_time"].max()
+    
+    watermarks = {
+        **high_marks,
+        "max_optin_time": None if max_optin_time is None else str(max_optin_time),
+        "max_purchased_at": None if max_purchased_at is None else str(max_purchased_at),
+    }
+    
+    # write to temporary files first so a failed refresh never leaves a torn snapshot
+    os.makedirs(snapshot_dir, exist_ok = True)
+    subscribers_joined_df.write_parquet(snapshot_path + ".tmp")
+    with open(watermarks_path + ".tmp", "w") as f:
+        json.dump(watermarks, f, indent = 2)
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+    os.replace(watermarks_path + ".tmp", watermarks_path)
+    
+    return subscribers_joined_df
+
+# MAINTENANCE ----
+
+# indexes on the join and filter keys of the ELS queries. The mailchimp_id
+# indexes are on the INTEGER cast the queries join on, and each index carries
+# the columns its query reads, so lookups never touch the table rows
+_ELS_INDEXES = {
+    "ix_subscribers_mailchimp_id": "Subscribers (CAST(mailchimp_id AS INTEGER))",
+    "ix_subscribers_user_email": "Subscribers (user_email)",
+    "ix_tags_mailchimp_id_tag": "Tags (CAST(mailchimp_id AS INTEGER), tag)",
+    "ix_transactions_user_email": "Transactions (user_email)",
+    "ix_subscriber_features_mailchimp_id": "subscriber_features (mailchimp_id)",
+}
+
+_ELS_FEATURES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS subscriber_features (
+        subscriber_rowid INTEGER PRIMARY KEY,
+        mailchimp_id INTEGER,
+        tag_count INTEGER NOT NULL,
+        made_purchase INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS subscriber_features_watermarks (
+        table_name TEXT PRIMARY KEY,
+        max_rowid INTEGER NOT NULL
+    )
+    """,
+]
+
+# new subscribers (rowid window) with tag counts and purchase flags as of the
+# Tags / Transactions high-water marks
+_ELS_FEATURES_INSERT_QUERY = """
+INSERT INTO subscriber_features (subscriber_rowid, mailchimp_id, tag_count, made_purchase)
+SELECT
+    s.rowid,
+    CAST(s.mailchimp_id AS INTEGER),
+    (
+        SELECT COUNT(t.tag) FROM Tags t
+        WHERE CAST(t.mailchimp_id AS INTEGER) = CAST(s.mailchimp_id AS INTEGER)
+          AND t.rowid <= :tags_hi
+    ),
+    EXISTS (
+        SELECT 1 FROM Transactions tr
+        WHERE tr.user_email = s.user_email AND tr.rowid <= :transactions_hi
+    )
+FROM Subscribers s
+WHERE s.rowid > :subscribers_lo AND s.rowid <= :subscribers_hi
+"""
+
+# new tags increment tag_count of the subscribers already materialized
+_ELS_FEATURES_TAG_DELTA_QUERY = """
+UPDATE subscriber_features
+SET tag_count = tag_count + (
+    SELECT COUNT(t.tag) FROM Tags t
+    WHERE CAST(t.mailchimp_id AS INTEGER) = subscriber_features.mailchimp_id
+      AND t.rowid > :tags_lo AND t.rowid <= :tags_hi
+)
+WHERE subscriber_rowid <= :subscribers_lo
+  AND mailchimp_id IN (
+      SELECT CAST(mailchimp_id AS INTEGER) FROM Tags
+      WHERE rowid > :tags_lo AND rowid <= :tags_hi
+  )
+"""
+
+# new transactions set made_purchase of the subscribers already materialized
+_ELS_FEATURES_TRANSACTION_DELTA_QUERY = """
+UPDATE subscriber_features
+SET made_purchase = 1
+WHERE made_purchase = 0
+  AND subscriber_rowid <= :subscribers_lo
+  AND subscriber_rowid IN (
+      SELECT s.rowid FROM Subscribers s
+      WHERE s.user_email IN (
+          SELECT user_email FROM Transactions
+          WHERE rowid > :transactions_lo AND rowid <= :transactions_hi
+      )
+  )
+"""
+
+def db_maintain_els_database(
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    full_refresh: bool = False,
+    analyze: bool = True,
+):
+    """Creates the ELS indexes and refreshes the materialized subscriber_features table
+
+    Creates the indexes on the mailchimp_id / user_email join keys if missing and
+    keeps subscriber_features (one row per subscriber: tag_count, made_purchase)
+    up to date for db_read_els_data(materialized=True). Like db_refresh_els_data,
+    the refresh is incremental on the SQLite rowid high-water marks, stored in
+    subscriber_features_watermarks: new subscribers are inserted with their
+    features, new tags and transactions update the existing rows. Rows updated or
+    deleted in place are not detected; use full_refresh=True to rebuild the table.
+    Everything runs in one transaction, so readers never see a partial refresh.
+
+    Args:
+        conn_string (string, optional): Connection string to the SQLite database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        full_refresh (bool, optional): Rebuild subscriber_features from scratch. Defaults to False.
+        analyze (bool, optional): Run ANALYZE afterwards so the query planner picks up the indexes. Defaults to True.
+
+    Returns:
+        dict: Number of subscribers inserted and the high-water marks the table is now current to
+    """
+    engine = db_get_engine(conn_string)
+    
+    with engine.begin() as conn:
+        
+        for statement in _ELS_FEATURES_DDL:
+            conn.execute(sql.text(statement))
+        
+        for name, target in _ELS_INDEXES.items():
+            conn.execute(sql.text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+        
+        watermarks = {"Subscribers": 0, "Tags": 0, "Transactions": 0}
+        watermarks.update(
+            conn.execute(sql.text("SELECT table_name, max_rowid FROM subscriber_features_watermarks")).all()
+        )
+        
+        high_marks = {
+            table: conn.execute(sql.text(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}")).scalar()
+            for table in watermarks
+        }
+        
+        # a table that shrank was rebuilt: start over
+        if full_refresh or any(high_marks[t] < watermarks[t] for t in high_marks):
+            conn.execute(sql.text("DELETE FROM subscriber_features"))
+            watermarks = dict.fromkeys(watermarks, 0)
+        
+        params = {
+            "subscribers_lo": watermarks["Subscribers"], "subscribers_hi": high_marks["Subscribers"],
+            "tags_lo": watermarks["Tags"], "tags_hi": high_marks["Tags"],
+            "transactions_lo": watermarks["Transactions"], "transactions_hi": high_marks["Transactions"],
+        }
+        
+        # existing rows first, so new subscribers are not counted twice
+        conn.execute(sql.text(_ELS_FEATURES_TAG_DELTA_QUERY), params)
+        conn.execute(sql.text(_ELS_FEATURES_TRANSACTION_DELTA_QUERY), params)
+        inserted = conn.execute(sql.text(_ELS_FEATURES_INSERT_QUERY), params).rowcount
+        
+        conn.execute(
+            sql.text("INSERT OR REPLACE INTO subscriber_features_watermarks (table_name, max_rowid) VALUES (:table_name, :max_rowid)"),
+            [{"table_name": table, "max_rowid": max_rowid} for table, max_rowid in high_marks.items()]
+        )
+        
+        if analyze:
+            conn.execute(sql.text("ANALYZE"))
+    
+    # new tables and indexes: reflect again on next use
+    _db_forget_catalog(engine)
+    
+    return {"inserted": inserted, **high_marks}
@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import sqlalchemy as sql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from .database import (
+    _ELS_DATA_COLUMNS,
+    _ELS_MATERIALIZED_QUERY,
+    _ELS_PUSHDOWN_QUERY,
+    _db_cache_load,
+    _db_cache_paths,
+    _db_cache_store,
+    _db_cast_els_data,
+    _db_check_materialized,
+    _db_combine_els_data,
+    _db_engine_kwargs,
+    _db_file_fingerprint,
+    _db_forget_catalog,
+    _db_frame_from_rows,
+    _db_get_catalog,
+    _db_table_fingerprint,
+    _db_table_select,
+)
+
+# ASYNC ENGINE REGISTRY ----
+
+# async drivers used when the connection string does not name one
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+_ASYNC_ENGINES = {}
+_ASYNC_ENGINES_LOCK = threading.Lock()
+
+def _db_async_conn_string(conn_string: str):
+    # 'sqlite:///x.sqlite' -> 'sqlite+aiosqlite:///x.sqlite'
+    url = sql.engine.make_url(conn_string)
+    
+    if url.drivername in _ASYNC_DRIVERS:
+        url = url.set(drivername = _ASYNC_DRIVERS[url.drivername])
+    
+    return url.render_as_string(hide_password = False)
+
+def db_get_async_engine(
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    pool_size: int = None,
+    max_overflow: int = None,
+    pool_pre_ping: bool = True
+):
+    """Returns the process-wide pooled async engine for a connection string, creating it on first use
+
+    Connection strings without an async driver get the default one for their
+    dialect (aiosqlite, asyncpg, aiomysql). The pool settings only apply when the
+    engine is created.
+
+    Args:
+        conn_string (string, optional): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        pool_size (int, optional): Number of pooled connections. Defaults to None (SQLAlchemy default for the dialect).
+        max_overflow (int, optional): Connections allowed beyond pool_size. Defaults to None (SQLAlchemy default).
+        pool_pre_ping (bool, optional): Test connections for liveness on checkout. Defaults to True.
+
+    Returns:
+        sqlalchemy AsyncEngine: Shared async engine for conn_string
+    """
+    conn_string = _db_async_conn_string(conn_string)
+    
+    with _ASYNC_ENGINES_LOCK:
+        
+        engine = _ASYNC_ENGINES.get(conn_string)
+        
+        if engine is None:
+            engine = create_async_engine(conn_string, **_db_engine_kwargs(pool_size, max_overflow, pool_pre_ping))
+            _ASYNC_ENGINES[conn_string] = engine
+    
+    return engine
+
+async def db_dispose_async_engines(conn_string: str = None):
+    """Disposes pooled async engines and removes them from the registry
+
+    Args:
+        conn_string (string, optional): Only dispose the engine for this connection string. Defaults to None (all engines).
+    """
+    with _ASYNC_ENGINES_LOCK:
+        conn_strings = list(_ASYNC_ENGINES) if conn_string is None else [_db_async_conn_string(conn_string)]
+        engines = [_ASYNC_ENGINES.pop(key) for key in conn_strings if key in _ASYNC_ENGINES]
+    
+    for engine in engines:
+        _db_forget_catalog(engine.sync_engine)
+        await engine.dispose()
+
+# ASYNC READERS ----
+
+# rows are fetched through the async driver; decoding them into polars and the
+# Arrow cache file I/O run on worker threads, so the event loop only awaits.
+# Catalog reflection and statement building go through run_sync, once per
+# engine and table
+
+async def _db_fetch_frame_async(conn, statement, schema_overrides: dict = None, date_columns: list = ()):
+    result = await conn.execute(statement)
+    column_names, rows = list(result.keys()), result.all()
+    
+    return await asyncio.to_thread(_db_frame_from_rows, column_names, rows, schema_overrides, date_columns)
+
+async def _db_read_table_async(engine, table: str, columns: list = None, cache_dir: str = None):
+    async with engine.connect() as conn:
+        
+        statement, schema_overrides, date_columns = await conn.run_sync(_db_table_select, table, columns)
+        
+        if cache_dir is None:
+            return await _db_fetch_frame_async(conn, statement, schema_overrides, date_columns)
+        
+        fingerprint = await asyncio.to_thread(_db_file_fingerprint, engine.url, table, columns)
+        
+        if fingerprint is None:
+            fingerprint = await conn.run_sync(_db_table_fingerprint, table, columns)
+        
+        if fingerprint is None:
+            return await _db_fetch_frame_async(conn, statement, schema_overrides, date_columns)
+        
+        cache_path, fingerprint_path = _db_cache_paths(cache_dir, table, columns)
+        
+        df = await asyncio.to_thread(_db_cache_load, cache_path, fingerprint_path, fingerprint)
+        
+        if df is None:
+            df = await _db_fetch_frame_async(conn, statement, schema_overrides, date_columns)
+            await asyncio.to_thread(_db_cache_store, df, cache_path, fingerprint_path, fingerprint)
+        
+        return df
+
+async def db_read_els_data_async(
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    pushdown: bool = False,
+    cache_dir: str = None,
+    materialized: bool = False,
+):
+    """Async version of db_read_els_data
+
+    Subscribers, Tags and Transactions are read concurrently, each on its own
+    pooled async connection.
+
+    Args:
+        conn_string (string, optional): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        pushdown (bool, optional): Compute tag counts, the join and made_purchase in a single SQL query instead of in polars. Defaults to False.
+        cache_dir (string, optional): Directory of the local Arrow cache for the raw tables, invalidated when the database changes. Defaults to None (no cache).
+        materialized (bool, optional): Read tag_count and made_purchase from the subscriber_features table kept by db_maintain_els_database; subscribers added since its last run are aggregated on the fly. Defaults to False.
+
+    Returns:
+        polars DataFrame: Combined raw data
+    """
+    if pushdown and materialized:
+        raise ValueError("pushdown=True and materialized=True are alternative query plans; pick one")
+    
+    if (pushdown or materialized) and cache_dir is not None:
+        raise ValueError("cache_dir caches the raw tables and cannot be combined with pushdown=True or materialized=True")
+    
+    engine = db_get_async_engine(conn_string)
+    
+    if pushdown or materialized:
+        query = _ELS_MATERIALIZED_QUERY if materialized else _ELS_PUSHDOWN_QUERY
+        
+        async with engine.connect() as conn:
+            if materialized:
+                await conn.run_sync(_db_check_materialized)
+            df = await _db_fetch_frame_async(conn, sql.text(query))
+        
+        return await asyncio.to_thread(_db_cast_els_data, df)
+    
+    subscribers_df, tags_df, transactions_df = await asyncio.gather(
+        *[
+            _db_read_table_async(engine, table, columns, cache_dir)
+            for table, columns in _ELS_DATA_COLUMNS.items()
+        ]
+    )
+    
+    return await asyncio.to_thread(_db_combine_els_data, subscribers_df, tags_df, transactions_df)
+
+async def db_read_els_table_names_async(
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+):
+    """Async version of db_read_els_table_names
+
+    Args:
+        conn_string (string, optional): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+
+    Returns:
+        list: List of table names
+    """
+    engine = db_get_async_engine(conn_string)
+    
+    async with engine.connect() as conn:
+        metadata = await conn.run_sync(_db_get_catalog)
+    
+    return sorted(metadata.tables)
+
+async def db_read_raw_els_table_async(
+    table: str = "Products",
+    conn_string: str = 'sqlite:///00_database/crm_database.sqlite',
+    cache_dir: str = None,
+):
+    """Async version of db_read_raw_els_table
+
+    Args:
+        table (string, optional): Name of the table. Defaults to "Products".
+        conn_string (string, optional): Connection string to the database. Defaults to 'sqlite:///00_database/crm_database.sqlite'.
+        cache_dir (string, optional): Directory of the local Arrow cache, invalidated when the database changes. Defaults to None (no cache).
+
+    Returns:
+        polars DataFrame: Raw table
+    """
+    engine = db_get_async_engine(conn_string)
+    
+    return await _db_read_table_async(engine, table, cache_dir = cache_dir)
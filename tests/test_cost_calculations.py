@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from email_lead_scoring import (
+    cost_cache_clear,
+    cost_cache_info,
+    cost_calc_monthly_cost_table,
+    cost_plot_simulated_unsub_cost,
+    cost_simulate_unsub_costs,
+    cost_total_unsub_cost,
+    cost_total_unsub_cost_analytic,
+)
+
+# ANALYTIC TOTALS ----
+
+def _table_totals(**params):
+    return cost_total_unsub_cost(cost_calc_monthly_cost_table(**params)).row(0)
+
+@pytest.mark.parametrize("email_list_growth_rate", [0, -1, 1e-12, 0.035])
+@pytest.mark.parametrize("n_periods", [0, 1, 12, 1200])
+def test_analytic_matches_cost_table(email_list_growth_rate, n_periods):
+    
+    params = dict(email_list_growth_rate = email_list_growth_rate, n_periods = n_periods)
+    
+    analytic = cost_total_unsub_cost_analytic(**params).row(0)
+    
+    np.testing.assert_allclose(analytic, _table_totals(**params), rtol = 1e-9, atol = 1e-9)
+
+def test_analytic_broadcasts_arrays():
+    
+    growth = np.array([[0.0], [-1.0], [1e-12], [0.035]])
+    conversion = np.array([0.04, 0.05, 0.06])
+    n_periods = np.array([0, 1, 1200])
+    
+    summary_df = cost_total_unsub_cost_analytic(
+        email_list_growth_rate = growth,
+        customer_conversion_rate = conversion,
+        n_periods = n_periods
+    )
+    
+    assert summary_df.height == growth.size * conversion.size
+    
+    # one row per element of the broadcast (growth x conversion / n_periods) grid
+    expected = [
+        _table_totals(email_list_growth_rate = g, customer_conversion_rate = c, n_periods = n)
+        for g, c, n in zip(*[a.ravel() for a in np.broadcast_arrays(growth, conversion, n_periods)])
+    ]
+    
+    np.testing.assert_allclose(summary_df.rows(), expected, rtol = 1e-9, atol = 1e-9)
+
+# COST CACHE ----
+
+def test_cache_shares_float_tolerant_keys():
+    
+    cost_cache_clear()
+    
+    cost_calc_monthly_cost_table(email_list_growth_rate = 0.035)
+    cost_calc_monthly_cost_table(email_list_growth_rate = np.float64(0.035))
+    cost_calc_monthly_cost_table(email_list_growth_rate = 0.035000000000000001)
+    
+    assert cost_cache_info()["hits"] == 2
+
+@pytest.mark.parametrize("first, second", [(1e5, 100000), (100000, 1e5)])
+def test_cache_keeps_int_and_float_inputs_apart(first, second):
+    
+    cost_cache_clear()
+    
+    cost_calc_monthly_cost_table(email_list_size = first)
+    
+    # dtypes follow the input kind, whichever call ran first
+    assert cost_calc_monthly_cost_table(email_list_size = second).schema == (
+        cost_calc_monthly_cost_table.__wrapped__(email_list_size = second).schema
+    )
+    assert cost_cache_info()["hits"] == 0
+
+# SIMULATION PLOT ----
+
+def test_plot_pools_lazy_and_eager_results_alike(tmp_path):
+    
+    params = dict(
+        email_list_monthly_growth_rate = np.linspace(0, 0.05, 45),
+        customer_conversion_rate = np.linspace(0.04, 0.06, 31),
+    )
+    
+    eager_df = cost_simulate_unsub_costs(**params)
+    streamed_lf = cost_simulate_unsub_costs(**params, output_dir = str(tmp_path / "sweep"))
+    
+    eager = cost_plot_simulated_unsub_cost(eager_df, max_resolution = (10, 10)).data[0]
+    lazy = cost_plot_simulated_unsub_cost(streamed_lf, max_resolution = (10, 10)).data[0]
+    
+    assert np.shape(eager.z) == (9, 8)
+    np.testing.assert_allclose(lazy.z, eager.z)
+    
+    # 5 x 4 blocks of the full grid, trailing blocks over their real cells
+    grid = eager_df.sort("email_list_monthly_growth_rate", "customer_conversion_rate")["cost_with_growth"].to_numpy().reshape(45, 31)
+    np.testing.assert_allclose(eager.z[0][0], grid[:5, :4].mean())
+    np.testing.assert_allclose(eager.z[-1][-1], grid[40:, 28:].mean())
@@ -0,0 +1,244 @@
+import json
+import os
+import sqlite3
+
+import pytest
+from polars.testing import assert_frame_equal
+
+from email_lead_scoring import (
+    db_dispose_engines,
+    db_maintain_els_database,
+    db_read_els_data,
+    db_read_raw_els_table,
+    db_refresh_els_data,
+)
+
+# SQLITE CRM FIXTURE ----
+
+_CRM_DDL = [
+    "CREATE TABLE Subscribers (mailchimp_id TEXT, user_full_name TEXT, user_email TEXT, member_rating REAL, optin_time TEXT, country_code TEXT)",
+    "CREATE TABLE Tags (mailchimp_id TEXT, tag TEXT)",
+    "CREATE TABLE Transactions (transaction_id REAL, purchased_at TEXT, user_full_name TEXT, user_email TEXT, charge_id TEXT, product_id REAL)",
+    "CREATE TABLE Products (product_id REAL, product_name TEXT)",
+]
+
+def _subscribers(ids):
+    return [
+        (str(i), f"User {i}", f"user{i}@x.com", float(i % 5 + 1), f"2020-{i % 12 + 1:02d}-{i % 28 + 1:02d}", ["us", "in", "au"][i % 3])
+        for i in ids
+    ]
+
+def _tags(ids, tag = "webinar"):
+    return [(str(i), f"{tag}_{j}") for i in ids for j in range(i % 4)]
+
+def _transactions(ids):
+    return [
+        (float(i), f"2021-{i % 12 + 1:02d}-15", f"User {i}", f"user{i}@x.com", "ch", float(i % 7))
+        for i in ids
+    ]
+
+def _execute(path, statement, rows = None):
+    with sqlite3.connect(path) as conn:
+        if rows is None:
+            conn.execute(statement)
+        else:
+            conn.executemany(statement, rows)
+    conn.close()
+
+def _insert(path, subscribers = (), tags = (), transactions = ()):
+    _execute(path, "INSERT INTO Subscribers VALUES (?, ?, ?, ?, ?, ?)", subscribers)
+    _execute(path, "INSERT INTO Tags VALUES (?, ?)", tags)
+    _execute(path, "INSERT INTO Transactions VALUES (?, ?, ?, ?, ?, ?)", transactions)
+
+@pytest.fixture
+def crm_db(tmp_path):
+    """Small SQLite CRM with the tables and column types of crm_database.sqlite"""
+    
+    path = str(tmp_path / "crm_database.sqlite")
+    
+    for statement in _CRM_DDL:
+        _execute(path, statement)
+    
+    ids = range(1000, 1040)
+    _insert(path, _subscribers(ids), _tags(ids), _transactions(ids[::3]))
+    
+    conn_string = f"sqlite:///{path}"
+    
+    yield path, conn_string
+    
+    db_dispose_engines(conn_string)
+
+def assert_same_els_data(df, expected_df):
+    assert_frame_equal(df.sort("mailchimp_id"), expected_df.sort("mailchimp_id"))
+
+# MAINTENANCE ----
+
+def test_materialized_requires_maintenance(crm_db):
+    
+    _, conn_string = crm_db
+    
+    with pytest.raises(ValueError, match = "db_maintain_els_database"):
+        db_read_els_data(conn_string, materialized = True)
+
+def test_materialized_matches_default_read(crm_db):
+    
+    _, conn_string = crm_db
+    
+    assert db_maintain_els_database(conn_string)["inserted"] == 40
+    
+    assert_same_els_data(db_read_els_data(conn_string, materialized = True), db_read_els_data(conn_string))
+
+def test_materialized_includes_subscribers_added_since_maintenance(crm_db):
+    
+    path, conn_string = crm_db
+    
+    db_maintain_els_database(conn_string)
+    
+    # new subscribers only: no features rows yet, aggregated on the fly
+    new_ids = range(2000, 2010)
+    _insert(path, _subscribers(new_ids), _tags(new_ids, "new"), _transactions(new_ids[::2]))
+    
+    df = db_read_els_data(conn_string, materialized = True)
+    
+    assert df.height == 50
+    assert_same_els_data(df, db_read_els_data(conn_string))
+
+def test_maintenance_applies_deltas_incrementally(crm_db):
+    
+    path, conn_string = crm_db
+    
+    db_maintain_els_database(conn_string)
+    
+    # tags and purchases of existing subscribers, plus new subscribers
+    _insert(
+        path,
+        subscribers = _subscribers(range(2000, 2005)),
+        tags = _tags(range(1000, 1040, 2), "delta") + _tags(range(2000, 2005), "new"),
+        transactions = _transactions(range(1001, 1040, 3)) + _transactions([2001]),
+    )
+    
+    assert db_maintain_els_database(conn_string)["inserted"] == 5
+    assert_same_els_data(db_read_els_data(conn_string, materialized = True), db_read_els_data(conn_string))
+    
+    # nothing new: nothing inserted, nothing counted twice
+    assert db_maintain_els_database(conn_string)["inserted"] == 0
+    assert_same_els_data(db_read_els_data(conn_string, materialized = True), db_read_els_data(conn_string))
+
+def test_maintenance_rebuilds_when_a_table_shrinks(crm_db):
+    
+    path, conn_string = crm_db
+    
+    db_maintain_els_database(conn_string)
+    
+    # the table was rebuilt with fewer rows: rowid watermarks are meaningless
+    _execute(path, "DELETE FROM Tags WHERE rowid > (SELECT MAX(rowid) / 2 FROM Tags)")
+    
+    assert db_maintain_els_database(conn_string)["inserted"] == 40
+    assert_same_els_data(db_read_els_data(conn_string, materialized = True), db_read_els_data(conn_string))
+
+# INCREMENTAL REFRESH ----
+
+def test_refresh_builds_the_initial_snapshot(crm_db, tmp_path):
+    
+    path, conn_string = crm_db
+    snapshot_dir = str(tmp_path / "snapshot")
+    
+    assert_same_els_data(db_refresh_els_data(conn_string, snapshot_dir), db_read_els_data(conn_string))
+    
+    with open(os.path.join(snapshot_dir, "watermarks.json")) as f:
+        watermarks = json.load(f)
+    
+    with sqlite3.connect(path) as conn:
+        max_purchased_at, = conn.execute("SELECT MAX(purchased_at) FROM Transactions").fetchone()
+    conn.close()
+    
+    assert watermarks["Subscribers"] == 40
+    assert watermarks["max_purchased_at"] == max_purchased_at
+
+def test_refresh_applies_inserts_incrementally(crm_db, tmp_path):
+    
+    path, conn_string = crm_db
+    snapshot_dir = str(tmp_path / "snapshot")
+    
+    db_refresh_els_data(conn_string, snapshot_dir)
+    
+    _insert(
+        path,
+        subscribers = _subscribers(range(2000, 2005)),
+        tags = _tags(range(1000, 1040, 2), "delta") + _tags(range(2000, 2005), "new"),
+        transactions = _transactions(range(1001, 1040, 3)) + _transactions([2001]),
+    )
+    
+    assert_same_els_data(db_refresh_els_data(conn_string, snapshot_dir), db_read_els_data(conn_string))
+
+def test_refresh_without_changes_keeps_the_snapshot(crm_db, tmp_path):
+    
+    _, conn_string = crm_db
+    snapshot_dir = str(tmp_path / "snapshot")
+    
+    first_df = db_refresh_els_data(conn_string, snapshot_dir)
+    
+    assert_same_els_data(db_refresh_els_data(conn_string, snapshot_dir), first_df)
+    assert_same_els_data(first_df, db_read_els_data(conn_string))
+
+def test_refresh_rebuilds_when_a_table_shrinks(crm_db, tmp_path):
+    
+    path, conn_string = crm_db
+    snapshot_dir = str(tmp_path / "snapshot")
+    
+    db_refresh_els_data(conn_string, snapshot_dir)
+    
+    _execute(path, "DELETE FROM Tags WHERE rowid > (SELECT MAX(rowid) / 2 FROM Tags)")
+    
+    assert_same_els_data(db_refresh_els_data(conn_string, snapshot_dir), db_read_els_data(conn_string))
+
+# TABLE CACHE ----
+
+def _cache_files(cache_dir):
+    return {name: os.stat(os.path.join(cache_dir, name)).st_mtime_ns for name in sorted(os.listdir(cache_dir))}
+
+@pytest.mark.parametrize("journal_mode", ["delete", "wal"])
+def test_cache_is_invalidated_by_writes(crm_db, tmp_path, journal_mode):
+    
+    path, conn_string = crm_db
+    cache_dir = str(tmp_path / "cache")
+    
+    _execute(path, f"PRAGMA journal_mode = {journal_mode}")
+    
+    db_read_raw_els_table("Subscribers", conn_string, cache_dir = cache_dir)
+    db_read_els_data(conn_string, cache_dir = cache_dir)
+    
+    # an in-place write within the same mtime tick as the cached read: same
+    # file size, and the mtime put back to what the cached read saw
+    stat = os.stat(path)
+    _execute(path, "UPDATE Subscribers SET user_full_name = 'Renamed' WHERE mailchimp_id = '1000'")
+    os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns))
+    
+    assert os.stat(path).st_size == stat.st_size
+    
+    raw_df = db_read_raw_els_table("Subscribers", conn_string, cache_dir = cache_dir)
+    
+    assert "Renamed" in raw_df["user_full_name"].to_list()
+    assert_same_els_data(db_read_els_data(conn_string, cache_dir = cache_dir), db_read_els_data(conn_string))
+
+def test_cache_keeps_projections_apart(crm_db, tmp_path):
+    
+    _, conn_string = crm_db
+    cache_dir = str(tmp_path / "cache")
+    
+    raw_df = db_read_raw_els_table("Subscribers", conn_string, cache_dir = cache_dir)
+    els_df = db_read_els_data(conn_string, cache_dir = cache_dir)
+    
+    cache_files = _cache_files(cache_dir)
+    
+    # one file for the raw table, one per projected table of the ELS read
+    assert "Subscribers.arrow" in cache_files
+    assert len([name for name in cache_files if name.endswith(".arrow")]) == 4
+    
+    # alternating reads are served from their own files, none rewritten
+    for _ in range(2):
+        assert_frame_equal(db_read_raw_els_table("Subscribers", conn_string, cache_dir = cache_dir), raw_df)
+        assert_frame_equal(db_read_els_data(conn_string, cache_dir = cache_dir), els_df)
+    
+    assert _cache_files(cache_dir) == cache_files
+    assert_frame_equal(raw_df, db_read_raw_els_table("Subscribers", conn_string))
@@ -0,0 +1,74 @@
+import importlib
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+clf = pytest.importorskip("pycaret.classification")
+xgboost = pytest.importorskip("xgboost")
+
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# APP MODULE ----
+
+@pytest.fixture(scope = "module")
+def app_module():
+    
+    # the app loads its model from a path relative to the project root
+    cwd = os.getcwd()
+    os.chdir(ROOT_DIR)
+    try:
+        yield importlib.import_module("00_jumpstart.02_fastapi_jumpstart")
+    finally:
+        os.chdir(cwd)
+
+@pytest.fixture(scope = "module")
+def pipeline():
+    
+    # small stand-in for the finalized model: encoding steps + XGBClassifier
+    rng = np.random.default_rng(0)
+    n = 2000
+    
+    X = pd.DataFrame({
+        "member_rating": rng.integers(1, 6, n).astype(float),
+        "country_code": rng.choice(["us", "in", "au", "uk", "br", "ca"], n),
+    })
+    y = ((X["member_rating"] + (X["country_code"] == "us") + rng.normal(0, 1, n)) > 4).astype(int)
+    
+    return Pipeline([
+        ("encoding", ColumnTransformer(
+            [("country_code", OneHotEncoder(handle_unknown = "ignore"), ["country_code"])],
+            remainder = "passthrough"
+        )),
+        ("actual_estimator", xgboost.XGBClassifier(n_estimators = 20, max_depth = 3)),
+    ]).fit(X, y)
+
+# BOOSTER PARITY ----
+
+@pytest.mark.parametrize("cache_size", [10_000, 4])
+def test_booster_scorer_matches_predict_model(app_module, pipeline, cache_size):
+    
+    rng = np.random.default_rng(1)
+    n = 500
+    
+    # repeated leads, an unseen country and missing values
+    leads_df = pd.DataFrame({
+        "member_rating": rng.choice([1.0, 2.0, 3.0, 4.0, 5.0, np.nan], n),
+        "country_code": rng.choice(["us", "in", "au", "uk", "xx", None], n),
+    })
+    
+    scorer = app_module.BoosterScorer(pipeline, cache_size = cache_size)
+    
+    expected_df = clf.predict_model(pipeline, data = leads_df)
+    
+    # twice: encoded rows come from the cache the second time
+    for _ in range(2):
+        actual_df = scorer.predict(leads_df)
+        
+        np.testing.assert_array_equal(actual_df["prediction_label"].to_numpy(), expected_df["prediction_label"].to_numpy())
+        np.testing.assert_allclose(actual_df["prediction_score"].to_numpy(), expected_df["prediction_score"].to_numpy(), atol = 1e-4)